@@ -0,0 +1,248 @@
+"""
+Benchmark deteksi wajah: waktu deteksi vs recall per preset (fast / balanced /
+accurate) pada fixture lokal, atau fixture sintetis deterministik (default).
+
+    python -m benchmarks.face_detection                                       # fixture sintetis 1920x1080
+    python -m benchmarks.face_detection --count 24 --seed 7 --size 1280x720
+    python -m benchmarks.face_detection --fixtures data/faces
+    python -m benchmarks.face_detection --fixtures data/faces --resize 1920   # simulasi upload 1080p
+
+Fixture sintetis: wajah kartun (kulit, alis, mata, hidung, mulut) yang
+dikenali Haar cascade, 1-4 wajah per gambar dengan ukuran 24-300 px di atas
+background bertekstur, lengkap dengan annotations.json. Dibuat di folder
+sementara lalu dihapus; --save-fixtures DIR untuk menyimpannya.
+
+Ground truth dibaca dari <fixtures>/annotations.json jika ada:
+    {"foto1.jpg": [[x, y, w, h], ...], ...}
+Tanpa anotasi, hasil preset referensi (--reference, default "accurate") dipakai
+sebagai ground truth sehingga recall = seberapa banyak wajah preset referensi
+yang ikut ditemukan preset lain.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict
+
+import cv2
+import numpy as np
+
+from services.face_model import DETECTION_PRESETS, FaceDetectionService, detection_params
+from utils.stats import percentile
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def draw_face(image: np.ndarray, center, radius: int) -> list:
+    """Gambar wajah kartun yang terdeteksi Haar cascade, return bounding box [x, y, w, h]"""
+    cx, cy = center
+    w, h = int(radius * 1.6), int(radius * 2)
+    cv2.ellipse(image, (cx, cy), (w // 2, h // 2), 0, 0, 360, (150, 170, 200), -1)
+    for side in (-1, 1):
+        ex, ey = cx + side * int(w * 0.22), cy - int(h * 0.12)
+        cv2.ellipse(image, (ex, ey - int(h * 0.09)), (int(w * 0.14), int(h * 0.025)), 0, 0, 360, (40, 50, 60), -1)
+        cv2.ellipse(image, (ex, ey), (int(w * 0.11), int(h * 0.05)), 0, 0, 360, (60, 60, 70), -1)
+        cv2.circle(image, (ex, ey), max(1, int(h * 0.03)), (20, 20, 20), -1)
+    cv2.ellipse(image, (cx, cy + int(h * 0.1)), (int(w * 0.08), int(h * 0.04)), 0, 0, 360, (110, 125, 160), -1)
+    cv2.ellipse(image, (cx, cy + int(h * 0.27)), (int(w * 0.2), int(h * 0.05)), 0, 0, 360, (60, 60, 130), -1)
+    return [cx - w // 2, cy - h // 2, w, h]
+
+
+def write_synthetic_fixtures(directory: str, count: int, width: int, height: int, seed: int):
+    """Tulis `count` gambar JPEG + annotations.json (deterministik untuk seed yang sama)"""
+    rng = np.random.RandomState(seed)
+    annotations = {}
+    for index in range(count):
+        # Background sama seperti benchmarks/video_pipeline.py (noise yang di-blur)
+        image = cv2.GaussianBlur((rng.rand(height, width, 3) * 255).astype(np.uint8), (15, 15), 0)
+
+        boxes = []
+        for _ in range(rng.randint(1, 5)):
+            # Ukuran log-uniform: wajah kecil (jauh dari kamera) sama seringnya dengan wajah besar
+            radius = int(np.exp(rng.uniform(np.log(15), np.log(150))))
+            for _ in range(20):
+                center = (rng.randint(radius * 2, width - radius * 2), rng.randint(radius * 2, height - radius * 2))
+                box = [center[0] - radius, center[1] - radius * 1.25, radius * 2, radius * 2.5]
+                if all(iou(box, other) == 0 for other in boxes):
+                    break
+            else:
+                continue
+            boxes.append(draw_face(image, center, radius))
+
+        # Blur ringan + noise sensor supaya tepi tidak terlalu tajam seperti gambar vektor
+        image = cv2.GaussianBlur(image, (0, 0), 1.2)
+        image = np.clip(image + rng.normal(0, 4, image.shape), 0, 255).astype(np.uint8)
+
+        name = f"synthetic_{index:03d}.jpg"
+        cv2.imwrite(os.path.join(directory, name), image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        annotations[name] = boxes
+
+    with open(os.path.join(directory, "annotations.json"), "w", encoding="utf-8") as f:
+        json.dump(annotations, f, indent=1)
+
+
+def load_fixtures(directory: str, resize: int = None) -> Dict[str, np.ndarray]:
+    images = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        image = cv2.imread(os.path.join(directory, name))
+        if image is None:
+            continue
+        if resize:
+            scale = resize / max(image.shape[:2])
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+        images[name] = image
+    return images
+
+
+def load_annotations(path: str, images: Dict[str, np.ndarray], resize: int = None) -> Dict[str, np.ndarray]:
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    annotations = {}
+    for name, boxes in raw.items():
+        if name not in images:
+            continue
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        if resize:
+            # Anotasi dalam koordinat file asli, ikut diskalakan seperti gambarnya
+            original = cv2.imread(os.path.join(os.path.dirname(path), name))
+            boxes *= resize / max(original.shape[:2])
+        annotations[name] = boxes
+    return annotations
+
+
+def iou(a, b) -> float:
+    ax1, ay1, aw, ah = a
+    bx1, by1, bw, bh = b
+    ix = max(0.0, min(ax1 + aw, bx1 + bw) - max(ax1, bx1))
+    iy = max(0.0, min(ay1 + ah, by1 + bh) - max(ay1, by1))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match(truth: np.ndarray, detected: np.ndarray, threshold: float) -> int:
+    """Jumlah box ground truth yang punya pasangan deteksi (greedy, satu-satu)"""
+    used = set()
+    matched = 0
+    for t in truth:
+        best, best_iou = None, threshold
+        for j, d in enumerate(detected):
+            if j in used:
+                continue
+            score = iou(t, d)
+            if score >= best_iou:
+                best, best_iou = j, score
+        if best is not None:
+            used.add(best)
+            matched += 1
+    return matched
+
+
+def run_preset(detector: FaceDetectionService, images: Dict[str, np.ndarray], preset: str, repeat: int):
+    timings = []
+    detections = {}
+    for name, image in images.items():
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            boxes = detector.detect_faces(image, preset)
+            best = min(best, time.perf_counter() - start)
+        timings.append(best * 1000)
+        detections[name] = boxes
+    return timings, detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Face detection benchmark: time vs recall per preset")
+    parser.add_argument("--fixtures", help="Folder gambar fixture; default: fixture sintetis di folder sementara")
+    parser.add_argument("--count", type=int, default=12, help="Jumlah gambar sintetis")
+    parser.add_argument("--size", default="1920x1080", help="Ukuran gambar sintetis WxH")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-fixtures", help="Simpan fixture sintetis ke folder ini (tidak dihapus)")
+    parser.add_argument("--annotations", help="JSON ground truth (default: <fixtures>/annotations.json jika ada)")
+    parser.add_argument("--presets", nargs="+", choices=list(DETECTION_PRESETS), default=list(DETECTION_PRESETS))
+    parser.add_argument("--reference", choices=list(DETECTION_PRESETS), default="accurate",
+                        help="Preset referensi jika tidak ada anotasi")
+    parser.add_argument("--resize", type=int, help="Skalakan fixture supaya sisi terpanjang = N px")
+    parser.add_argument("--iou", type=float, default=0.4, help="IoU minimum agar deteksi dihitung cocok")
+    parser.add_argument("--repeat", type=int, default=3, help="Waktu per gambar = run tercepat dari N")
+    parser.add_argument("--output", help="Simpan hasil ke file JSON")
+    args = parser.parse_args()
+
+    fixtures = args.fixtures
+    if fixtures is None:
+        width, height = (int(v) for v in args.size.lower().split("x"))
+        fixtures = args.save_fixtures or tempfile.mkdtemp(prefix="face_fixtures_")
+        os.makedirs(fixtures, exist_ok=True)
+        write_synthetic_fixtures(fixtures, args.count, width, height, args.seed)
+        print(f"Synthetic fixtures: {args.count} images {width}x{height}, seed {args.seed} ({fixtures})")
+
+    try:
+        return run(args, fixtures)
+    finally:
+        if args.fixtures is None and args.save_fixtures is None:
+            shutil.rmtree(fixtures, ignore_errors=True)
+
+
+def run(args, fixtures: str) -> int:
+    images = load_fixtures(fixtures, args.resize)
+    if not images:
+        print(f"❌ No images found in {fixtures}")
+        return 1
+
+    detector = FaceDetectionService()
+    annotations_path = args.annotations or os.path.join(fixtures, "annotations.json")
+    if os.path.exists(annotations_path):
+        truth = load_annotations(annotations_path, images, args.resize)
+        truth_source = annotations_path
+    else:
+        _, truth = run_preset(detector, images, args.reference, 1)
+        truth_source = f"preset '{args.reference}'"
+    total_truth = sum(len(boxes) for boxes in truth.values())
+
+    sizes = [image.shape[:2] for image in images.values()]
+    print(f"{len(images)} images, median size {int(np.median([s[1] for s in sizes]))}x"
+          f"{int(np.median([s[0] for s in sizes]))}, {total_truth} faces in ground truth ({truth_source})")
+    print(f"{'preset':<10}{'detect size':>13}{'scale f.':>10}{'min face':>10}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'total s':>9}{'faces':>7}{'recall':>8}{'precision':>11}")
+
+    results = {}
+    median_height, median_width = sorted(sizes)[len(sizes) // 2]
+    for preset in args.presets:
+        timings, detections = run_preset(detector, images, preset, args.repeat)
+        matched = sum(match(truth.get(name, np.empty((0, 4))), detections[name], args.iou) for name in images)
+        detected = sum(len(boxes) for boxes in detections.values())
+        ordered = sorted(timings)
+
+        scale, scale_factor, min_size = detection_params(median_height, median_width, DETECTION_PRESETS[preset])
+        results[preset] = {
+            "p50_ms": round(percentile(ordered, 0.5), 2),
+            "p95_ms": round(percentile(ordered, 0.95), 2),
+            "total_s": round(sum(timings) / 1000, 3),
+            "faces": detected,
+            "recall": round(matched / total_truth, 4) if total_truth else None,
+            "precision": round(matched / detected, 4) if detected else None,
+        }
+        r = results[preset]
+        print(
+            f"{preset:<10}{f'{int(median_width * scale)}x{int(median_height * scale)}':>13}{scale_factor:>10.3f}"
+            f"{min_size / scale:>9.0f}px{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['total_s']:>9.2f}{detected:>7}"
+            f"{(r['recall'] if r['recall'] is not None else float('nan')):>8.1%}"
+            f"{(r['precision'] if r['precision'] is not None else float('nan')):>11.1%}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"ground_truth": truth_source, "images": len(images), "presets": results}, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,375 @@
+"""
+Benchmark pipeline teks: throughput + p50/p95/p99 per stage dan end-to-end,
+dibandingkan dengan baseline JSON. Gagal (exit code 1) jika ada stage yang
+regresi melewati threshold atau jika hasil prediksi berubah.
+
+Supaya gate tidak flaky:
+- tiap input diambil waktu tercepatnya dari `repeat` ronde;
+- pengukuran diulang di `--processes` proses baru dan dirata-rata, karena
+  kecepatan stage kecil bisa beda ~1.5x antar proses (layout memori, VM);
+- baseline diskalakan dengan stage referensi (kerja Python murni tetap) dari
+  run yang sama, jadi mesin yang sedang lebih lambat tidak dihitung regresi.
+
+    python -m benchmarks.text_pipeline                    # bandingkan dengan baseline
+    python -m benchmarks.text_pipeline --update-baseline  # simpan hasil sebagai baseline baru
+"""
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from services.text_model import TextEmotionModel
+from utils import text_processing
+from utils.text_processing import (
+    build_document,
+    extract_text_features,
+    keyword_based_emotion,
+    preprocess_text,
+    validate_and_correct_words,
+)
+from utils.stats import percentile
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline_text.json")
+
+# Kata pengisi non-emosi per bahasa
+FILLER_WORDS = {
+    "id": ["aku", "kamu", "dia", "kita", "hari", "ini", "itu", "yang", "dan", "di", "ke", "dari",
+           "sudah", "belum", "akan", "lagi", "sama", "banget", "sekali", "kenapa", "kok", "sih"],
+    "slang": ["gue", "lu", "bgt", "wkwk", "anjir", "gak", "udah", "kuy", "otw", "mager", "gabut",
+              "sih", "dong", "deh", "btw", "lol", "njir", "santuy", "bucin", "gpercaya"],
+    "en": ["i", "you", "the", "is", "are", "was", "today", "really", "so", "very", "this",
+           "that", "with", "my", "your", "just", "about", "and", "but", "because"],
+}
+
+LENGTH_BUCKETS = {"short": (1, 5), "medium": (6, 25), "long": (60, 200)}
+OOV_RATES = (0.0, 0.2, 0.5)
+
+
+def _oov_word(rng: random.Random) -> str:
+    return "".join(rng.choice("abcdeghijklmnoprstuwy") for _ in range(rng.randint(3, 10)))
+
+
+def _mutate(word: str, rng: random.Random) -> str:
+    if len(word) < 3:
+        return word + word[-1]
+    i = rng.randrange(len(word))
+    roll = rng.random()
+    if roll < 0.4:
+        return word[:i] + word[i + 1:]
+    if roll < 0.7:
+        return word[:i] + word[i] + word[i:]
+    return word[:i] + rng.choice("aiueo") + word[i + 1:]
+
+
+def generate_corpus(size: int, seed: int) -> List[str]:
+    """
+    Corpus deterministik campuran Indonesia / slang / Inggris dengan variasi
+    panjang dan rasio kata out-of-vocabulary (kata acak / keyword yang typo)
+    """
+    rng = random.Random(seed)
+    keywords = sorted({kw for kws in text_processing.EMOTION_VOCABULARY.values() for kw in kws})
+    languages = sorted(FILLER_WORDS)
+    buckets = sorted(LENGTH_BUCKETS)
+
+    corpus = []
+    for i in range(size):
+        language = languages[i % len(languages)]
+        low, high = LENGTH_BUCKETS[buckets[(i // len(languages)) % len(buckets)]]
+        oov_rate = OOV_RATES[(i // (len(languages) * len(buckets))) % len(OOV_RATES)]
+
+        words = []
+        for _ in range(rng.randint(low, high)):
+            roll = rng.random()
+            if roll < oov_rate:
+                words.append(_oov_word(rng) if rng.random() < 0.5 else _mutate(rng.choice(keywords), rng))
+            elif roll < oov_rate + 0.25:
+                words.append(rng.choice(keywords))
+            else:
+                words.append(rng.choice(FILLER_WORDS[language]))
+        text = " ".join(words)
+        if rng.random() < 0.2:
+            text = text.upper() if rng.random() < 0.3 else text.capitalize()
+        text += rng.choice(["", "", "!", "!!", "?", ".", " 😡", " https://example.com/x"])
+        corpus.append(text)
+    return corpus
+
+
+def time_stage(func: Callable, inputs: List, repeat: int) -> Dict:
+    """
+    Jalankan stage atas seluruh input sebanyak `repeat` ronde dan laporkan
+    waktu tercepat per input (seperti timeit), supaya interupsi sesaat di
+    satu ronde tidak menggeser persentil dan memicu gate
+    """
+    best = [float("inf")] * len(inputs)
+    for _ in range(repeat):
+        # GC dimatikan selama pengukuran supaya pause GC tidak jadi noise antar run
+        gc.collect()
+        gc.disable()
+        try:
+            for i, item in enumerate(inputs):
+                start = time.perf_counter_ns()
+                func(item)
+                best[i] = min(best[i], (time.perf_counter_ns() - start) / 1000.0)
+        finally:
+            gc.enable()
+    best.sort()
+
+    total_seconds = sum(best) / 1e6
+    return {
+        "calls": len(best),
+        "throughput_per_sec": round(len(best) / total_seconds, 1) if total_seconds else 0.0,
+        "p50_us": round(percentile(best, 0.50), 2),
+        "p95_us": round(percentile(best, 0.95), 2),
+        "p99_us": round(percentile(best, 0.99), 2),
+    }
+
+
+def _reference_work(text: str) -> int:
+    # Kerja Python murni yang tidak bergantung kode repo: split, lower, dict, sort
+    counts: Dict[str, int] = {}
+    for word in text.lower().split():
+        counts[word] = counts.get(word, 0) + 1
+    return len(sorted(counts))
+
+
+def reference_us(corpus: List[str], repeat: int) -> float:
+    """Skala kecepatan mesin di run ini: total waktu tercepat stage referensi (us)"""
+    stats = time_stage(_reference_work, corpus, repeat)
+    return round(stats["calls"] / stats["throughput_per_sec"] * 1e6, 2)
+
+
+def _timed(func: Callable, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def prediction_fingerprint(model: TextEmotionModel, corpus: List[str]) -> Dict:
+    predictions = []
+    for text in corpus:
+        emotion, confidence, scores = model.predict(text)
+        corrected_digest = hashlib.sha1(scores["corrected_text"].encode("utf-8")).hexdigest()[:10]
+        predictions.append(f"{emotion}:{confidence:.6f}:{corrected_digest}")
+    digest = hashlib.sha256("\n".join(predictions).encode("utf-8")).hexdigest()
+    return {"sha256": digest, "predictions": predictions}
+
+
+def run_benchmark(size: int, seed: int, repeat: int) -> Dict:
+    corpus = generate_corpus(size, seed)
+    model = TextEmotionModel(cache_size=0)
+
+    # Stage diukur tanpa cache token supaya yang terukur memang kerja pipeline-nya
+    token_cache_size = text_processing.TOKEN_CACHE.maxsize
+    text_processing.TOKEN_CACHE.maxsize = 0
+    text_processing.TOKEN_CACHE.clear()
+    try:
+        preprocessed = [preprocess_text(text) for text in corpus]
+        corrected = [validate_and_correct_words(text)[0] for text in preprocessed]
+
+        # Warm-up (import lazy, alokasi pertama, dsb)
+        for text in corpus[:50]:
+            model.predict(text)
+
+        # Referensi diukur sebelum dan sesudah stage, yang tercepat dipakai
+        reference = reference_us(corpus, repeat)
+        stages = {
+            "preprocess_text": time_stage(preprocess_text, corpus, repeat),
+            "build_document": time_stage(build_document, corpus, repeat),
+            "validate_and_correct_words": time_stage(validate_and_correct_words, preprocessed, repeat),
+            "extract_text_features": time_stage(extract_text_features, preprocessed, repeat),
+            "keyword_based_emotion": time_stage(keyword_based_emotion, corrected, repeat),
+            "predict": time_stage(model.predict, corpus, repeat),
+        }
+
+        elapsed = min(_timed(model.predict_batch, corpus) for _ in range(repeat))
+        stages["predict_batch"] = {
+            "calls": len(corpus),
+            "throughput_per_sec": round(len(corpus) / elapsed, 1),
+        }
+
+        reference = min(reference, reference_us(corpus, repeat))
+        fingerprint = prediction_fingerprint(model, corpus)
+    finally:
+        text_processing.TOKEN_CACHE.maxsize = token_cache_size
+
+    # End-to-end dengan cache token + prediksi aktif (kondisi production)
+    warm_model = TextEmotionModel()
+    for text in corpus:
+        warm_model.predict(text)
+    stages["predict_warm_cache"] = time_stage(warm_model.predict, corpus, repeat)
+
+    return {
+        "config": {"size": size, "seed": seed, "repeat": repeat},
+        "environment": {"python": platform.python_version(), "machine": platform.machine()},
+        "lexicon_version": text_processing.get_lexicon().version,
+        "reference_us": reference,
+        "stages": stages,
+        "predictions_sha256": fingerprint["sha256"],
+        "predictions": fingerprint["predictions"],
+    }
+
+
+def speed_scale(result: Dict, baseline: Dict) -> float:
+    """Rasio kecepatan mesin run ini vs baseline (>1 = mesin sedang lebih lambat)"""
+    if result.get("reference_us") and baseline.get("reference_us"):
+        return result["reference_us"] / baseline["reference_us"]
+    return 1.0
+
+
+def run_processes(size: int, seed: int, repeat: int, processes: int) -> Dict:
+    """
+    Jalankan run_benchmark di `processes` proses baru (berurutan, supaya tidak
+    saling berebut CPU) lalu rata-ratakan metriknya
+    """
+    results = []
+    for _ in range(processes):
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        try:
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.text_pipeline", "--worker", "--output", path,
+                 "--size", str(size), "--seed", str(seed), "--repeat", str(repeat)],
+                check=True, stdout=subprocess.DEVNULL
+            )
+            with open(path, encoding="utf-8") as f:
+                results.append(json.load(f))
+        finally:
+            os.remove(path)
+
+    if len({result["predictions_sha256"] for result in results}) > 1:
+        raise RuntimeError("Predictions differ between benchmark processes (non-deterministic pipeline)")
+
+    result = dict(results[0])
+    result["config"] = {**result["config"], "processes": processes}
+    result["reference_us"] = round(statistics.mean(r["reference_us"] for r in results), 2)
+    result["stages"] = {}
+    for stage, stats in results[0]["stages"].items():
+        result["stages"][stage] = {
+            metric: value if metric == "calls" else round(
+                statistics.mean(r["stages"][stage][metric] for r in results), 1 if metric == "throughput_per_sec" else 2
+            )
+            for metric, value in stats.items()
+        }
+    return result
+
+
+def compare(result: Dict, baseline: Dict, threshold: float) -> List[str]:
+    failures = []
+    scale = speed_scale(result, baseline)
+
+    if result["predictions_sha256"] != baseline.get("predictions_sha256"):
+        changed = [
+            i for i, (new, old) in enumerate(zip(result["predictions"], baseline.get("predictions", [])))
+            if new != old
+        ]
+        failures.append(f"predictions changed for {len(changed)} of {len(result['predictions'])} texts")
+        for i in changed[:5]:
+            failures.append(f"  #{i}: {baseline['predictions'][i]!r} -> {result['predictions'][i]!r}")
+
+    for stage, stats in result["stages"].items():
+        old = baseline.get("stages", {}).get(stage)
+        if not old:
+            continue
+        for metric in ("p50_us", "p95_us"):
+            if not (metric in stats and old.get(metric)):
+                continue
+            expected = old[metric] * scale
+            if stats[metric] > expected * (1 + threshold):
+                failures.append(
+                    f"{stage}.{metric} regressed: {old[metric]} -> {stats[metric]} "
+                    f"(+{(stats[metric] / expected - 1):.0%} after machine scale {scale:.2f}, "
+                    f"threshold {threshold:.0%})"
+                )
+        expected = old.get("throughput_per_sec", 0) / scale
+        if expected and stats["throughput_per_sec"] < expected / (1 + threshold):
+            failures.append(
+                f"{stage}.throughput_per_sec regressed: {old['throughput_per_sec']} -> {stats['throughput_per_sec']} "
+                f"(machine scale {scale:.2f})"
+            )
+    return failures
+
+
+def print_report(result: Dict, baseline: Dict = None):
+    scale = speed_scale(result, baseline or {})
+    print(f"reference stage: {result['reference_us']} us (machine scale vs baseline {scale:.2f})")
+    print(f"{'stage':<28}{'calls':>8}{'ops/s':>12}{'p50 us':>10}{'p95 us':>10}{'p99 us':>10}{'vs base p50':>13}")
+    for stage, stats in result["stages"].items():
+        old = (baseline or {}).get("stages", {}).get(stage, {})
+        delta = ""
+        if old.get("p50_us") and "p50_us" in stats:
+            delta = f"{stats['p50_us'] / (old['p50_us'] * scale) - 1:+.0%}"
+        print(
+            f"{stage:<28}{stats['calls']:>8}{stats['throughput_per_sec']:>12}"
+            f"{stats.get('p50_us', ''):>10}{stats.get('p95_us', ''):>10}{stats.get('p99_us', ''):>10}{delta:>13}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Text pipeline benchmark with regression gates")
+    parser.add_argument("--size", type=int, default=600, help="Jumlah teks di corpus sintetis")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--repeat", type=int, default=3, help="Ronde per stage di tiap proses")
+    parser.add_argument("--processes", type=int, default=5, help="Jumlah proses pengukuran yang dirata-rata")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.3, help="Regresi maksimum yang diizinkan (0.3 = 30%%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", help="Simpan hasil run ini ke file JSON")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        # Satu proses pengukuran, dipanggil oleh run_processes
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(run_benchmark(args.size, args.seed, args.repeat), f, ensure_ascii=False)
+        return 0
+
+    result = run_processes(args.size, args.seed, args.repeat, args.processes)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print_report(result, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=1, ensure_ascii=False)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=1, ensure_ascii=False)
+        print(f"✅ Baseline written to {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"❌ Baseline not found: {args.baseline} (run with --update-baseline)")
+        return 2
+
+    if baseline.get("config") != result["config"]:
+        print(f"❌ Benchmark config differs from baseline: {baseline.get('config')} vs {result['config']}")
+        return 2
+
+    failures = compare(result, baseline, args.threshold)
+    if failures:
+        print("❌ Benchmark gate failed:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+
+    print("✅ No regressions, predictions unchanged")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
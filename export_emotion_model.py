@@ -0,0 +1,153 @@
+"""
+Export bobot CNN emosi (Keras .h5) ke backend inference ringan dan cek
+parity akurasinya terhadap model Keras.
+
+    python export_emotion_model.py --calibration-dir data/faces
+    python export_emotion_model.py --formats tflite-fp16 onnx --weights models/model.h5
+
+Hasil dipakai server dengan CNN_BACKEND=tflite|onnx dan CNN_BACKEND_PATH=<file>.
+Kuantisasi int8 butuh calibration set (folder berisi crop wajah).
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from services.cnn_backends import load_backend
+from services.emotion_cnn_model import EmotionCNNModel
+
+
+FORMATS = ("tflite-fp16", "tflite-int8", "onnx")
+OUTPUT_NAMES = {
+    "tflite-fp16": "emotion_cnn_fp16.tflite",
+    "tflite-int8": "emotion_cnn_int8.tflite",
+    "onnx": "emotion_cnn.onnx",
+}
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_face_crops(model: EmotionCNNModel, directory: str, limit: int) -> np.ndarray:
+    """Crop wajah dari folder (rekursif) -> batch input model (N, 48, 48, 1)"""
+    samples = []
+    for root, _, files in sorted(os.walk(directory)):
+        for name in sorted(files):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            image = cv2.imread(os.path.join(root, name))
+            if image is None:
+                continue
+            samples.append(model.preprocess_face(image))
+            if len(samples) >= limit:
+                return np.stack(samples)
+    if not samples:
+        raise ValueError(f"No face images found in {directory}")
+    return np.stack(samples)
+
+
+def export_tflite(keras_model, path: str, quantization: str, calibration: np.ndarray = None):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "fp16":
+        converter.target_spec.supported_types = [tf.float16]
+    else:
+        # Post-training full integer quantization, input/output tetap float32
+        def representative_dataset():
+            for sample in calibration:
+                yield [sample[np.newaxis]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    with open(path, "wb") as f:
+        f.write(converter.convert())
+
+
+def export_onnx(keras_model, path: str, opset: int):
+    try:
+        import tf2onnx
+    except ImportError:
+        raise RuntimeError("tf2onnx is not installed, `pip install tf2onnx` to export ONNX")
+    import tensorflow as tf
+
+    signature = [tf.TensorSpec((None, 48, 48, 1), tf.float32, name="input")]
+    tf2onnx.convert.from_keras(keras_model, input_signature=signature, opset=opset, output_path=path)
+
+
+def parity(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    diff = np.abs(reference - candidate)
+    return {
+        "top1_agreement": float((reference.argmax(axis=1) == candidate.argmax(axis=1)).mean()),
+        "max_abs_diff": float(diff.max()),
+        "mean_abs_diff": float(diff.mean()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export emotion CNN to TFLite / ONNX with parity check")
+    parser.add_argument("--weights", default="models/model.h5")
+    parser.add_argument("--out-dir", default="models")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=["tflite-fp16", "tflite-int8"])
+    parser.add_argument("--calibration-dir", help="Folder crop wajah untuk kalibrasi int8 dan parity check")
+    parser.add_argument("--calibration-size", type=int, default=300)
+    parser.add_argument("--validation-dir", help="Folder crop wajah untuk parity check (default: calibration-dir)")
+    parser.add_argument("--validation-size", type=int, default=1000)
+    parser.add_argument("--min-agreement", type=float, default=0.98, help="Top-1 agreement minimum vs Keras")
+    parser.add_argument("--opset", type=int, default=13)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    model = EmotionCNNModel(model_path=args.weights, backend="keras")
+    if model.batcher is not None:
+        model.batcher = None  # export berjalan sinkron, tidak perlu thread batcher
+
+    calibration = None
+    if args.calibration_dir:
+        calibration = load_face_crops(model, args.calibration_dir, args.calibration_size)
+    if "tflite-int8" in args.formats and calibration is None:
+        parser.error("tflite-int8 needs --calibration-dir")
+
+    validation_dir = args.validation_dir or args.calibration_dir
+    if validation_dir:
+        validation = load_face_crops(model, validation_dir, args.validation_size)
+    else:
+        print("⚠️  No validation images, parity check uses random inputs")
+        validation = np.random.RandomState(args.seed).rand(256, 48, 48, 1).astype(np.float32)
+
+    reference = model.backend.predict(validation)
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    failed = False
+    for fmt in args.formats:
+        path = os.path.join(args.out_dir, OUTPUT_NAMES[fmt])
+        start = time.perf_counter()
+        if fmt == "onnx":
+            export_onnx(model.model, path, args.opset)
+        else:
+            export_tflite(model.model, path, fmt.split("-")[1], calibration)
+        export_seconds = time.perf_counter() - start
+
+        backend = load_backend("onnx" if fmt == "onnx" else "tflite", path)
+        start = time.perf_counter()
+        candidate = backend.predict(validation)
+        infer_ms = (time.perf_counter() - start) * 1000
+
+        report = parity(reference, candidate)
+        ok = report["top1_agreement"] >= args.min_agreement
+        failed = failed or not ok
+        print(
+            f"{'✅' if ok else '❌'} {fmt:<12} {os.path.getsize(path) / 1024:8.1f} KB  "
+            f"export {export_seconds:5.1f}s  load {backend.load_seconds * 1000:6.1f} ms  "
+            f"infer {infer_ms:7.1f} ms/{len(validation)}  top1 {report['top1_agreement']:.2%}  "
+            f"max|diff| {report['max_abs_diff']:.4f}  -> {path}"
+        )
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
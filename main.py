@@ -1,8 +1,22 @@
 import os
+import signal
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import text, vision 
+from starlette.concurrency import run_in_threadpool
+from routers import camera, text, vision
+from services.model_registry import registry
+from services.vision_pipeline import inference_executor
+from utils import worker_health
+from utils.text_processing import reload_lexicon
+
+# Model yang di-load saat startup (dipisah koma, kosong = tidak ada), supaya
+# request pertama tidak me-load TensorFlow / cascade di event loop
+PRELOAD_MODELS = [
+    name.strip()
+    for name in os.environ.get("PRELOAD_MODELS", "emotion_cnn,face_detector,text_rule,text_linear").split(",")
+    if name.strip()
+]
 
 app = FastAPI(
     title="Emotion & Anger Detection API",
@@ -23,6 +37,42 @@ app.add_middleware(
 app.include_router(text.router, prefix="/api/text", tags=["Text Analysis"])
 # 2. Vision / Face Analysis
 app.include_router(vision.router) 
+# 3. Camera / Webcam Analysis
+app.include_router(camera.router, tags=["Camera"])
+
+
+# --- HOT RELOAD LEXICON ---
+# `kill -HUP <pid>` me-load ulang artifact lexicon (TEXT_LEXICON_PATH) tanpa restart
+def _reload_lexicon_on_signal(signum, frame):
+    try:
+        lexicon = reload_lexicon()
+        print(f"✅ [Lexicon] Reloaded {lexicon.version}")
+    except Exception as e:
+        print(f"❌ [Lexicon] Reload failed: {e}")
+
+if hasattr(signal, "SIGHUP"):
+    signal.signal(signal.SIGHUP, _reload_lexicon_on_signal)
+
+
+@app.on_event("startup")
+async def _start_workers():
+    # Pool executor dan model dibuat sebelum request pertama, bukan dari dalam request.
+    # Load model di thread supaya event loop tetap responsif selama startup
+    inference_executor.start()
+    for name in PRELOAD_MODELS:
+        try:
+            await run_in_threadpool(registry.get, name)
+        except Exception as e:
+            # Model gagal di-load: request yang membutuhkannya akan mencoba lagi
+            print(f"❌ [Startup] Preload {name} failed: {e}")
+
+
+@app.on_event("shutdown")
+def _shutdown_workers():
+    text_model = registry.peek("text_rule")
+    if text_model is not None:
+        text_model.shutdown()
+    inference_executor.shutdown()
 
 
 # --- HEALTH CHECK ---
@@ -30,6 +80,16 @@ app.include_router(vision.router)
 async def health_check():
     return {"status": "healthy", "message": "API is running"}
 
+@app.get("/health/workers")
+async def worker_status():
+    """Heartbeat semua worker (jika dijalankan lewat serve.py)"""
+    return worker_health.snapshot()
+
+@app.get("/models")
+async def loaded_models():
+    """Model yang sudah di-load di worker ini beserta load time dan kenaikan RSS"""
+    return registry.stats()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to Emotion Detection API. Documentation at /docs"}
@@ -0,0 +1,101 @@
+import base64
+import json
+import os
+import uuid
+from typing import Dict, Literal, Optional
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from services.vision_pipeline import (
+    ANNOTATION_JPEG_QUALITY,
+    THUMBNAIL_JPEG_QUALITY,
+    THUMBNAIL_MAX_SIDE,
+    PreparedImage,
+    inference_executor,
+    render_prepared_jpeg,
+)
+
+# Bentuk gambar anotasi di response:
+#   base64    : JPEG ukuran penuh sebagai data URL di JSON (default, perilaku lama)
+#   thumbnail : JPEG diperkecil (max_side) sebagai data URL di JSON
+#   jpeg      : body image/jpeg, hasil analisis di header X-Analysis (JSON,
+#               diringkas jika melebihi ANNOTATION_HEADER_MAX_BYTES)
+#   multipart : multipart/mixed, part 1 JSON, part 2 image/jpeg
+#   none      : hanya JSON (box), tanpa menggambar/encode apa pun
+AnnotationOutput = Literal["base64", "thumbnail", "jpeg", "multipart", "none"]
+
+# Batas ukuran header X-Analysis. Proxy umumnya menolak header response besar
+# (nginx default 4-8 KB per buffer), jadi frame dengan banyak wajah hanya
+# mendapat ringkasan; hasil lengkap tersedia lewat output=multipart.
+ANNOTATION_HEADER_MAX_BYTES = int(os.environ.get("ANNOTATION_HEADER_MAX_BYTES", 4096))
+
+
+def negotiate_output(request: Request, output: Optional[str]) -> str:
+    """Parameter ?output= menang, selain itu dari header Accept"""
+    if output:
+        return output
+    accept = request.headers.get("accept", "")
+    if "multipart/mixed" in accept:
+        return "multipart"
+    if "image/jpeg" in accept and "application/json" not in accept:
+        return "jpeg"
+    return "base64"
+
+
+def _without_lists(payload: Dict) -> Dict:
+    return {key: _without_lists(value) if isinstance(value, dict) else value
+            for key, value in payload.items() if not isinstance(value, list)}
+
+
+def analysis_header(payload: Dict, max_bytes: int = ANNOTATION_HEADER_MAX_BYTES) -> str:
+    """
+    JSON compact untuk header X-Analysis. Jika melebihi max_bytes, list
+    (faces, dst.) dibuang dan ditandai "truncated": true; jumlah wajah tetap
+    ada di faces_detected / message.
+    """
+    header = json.dumps(payload, separators=(",", ":"))
+    if len(header) <= max_bytes:
+        return header
+    return json.dumps({**_without_lists(payload), "truncated": True}, separators=(",", ":"))
+
+
+def _multipart(payload: Dict, jpeg: bytes) -> Response:
+    boundary = uuid.uuid4().hex
+    body = b"".join([
+        f"--{boundary}\r\nContent-Type: application/json\r\n\r\n".encode(),
+        json.dumps(payload).encode(),
+        f"\r\n--{boundary}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode(),
+        jpeg,
+        f"\r\n--{boundary}--\r\n".encode(),
+    ])
+    return Response(content=body, media_type=f"multipart/mixed; boundary={boundary}")
+
+
+async def annotated_response(payload: Dict, image_key: str, output: str, image: PreparedImage, boxes, labels,
+                             quality: Optional[int] = None, max_side: Optional[int] = None) -> Response:
+    """
+    Response endpoint beranotasi sesuai `output`. Warna di-decode, digambar dan
+    di-encode (di inference executor) hanya jika output membutuhkannya; box
+    dalam koordinat gambar asli.
+    """
+    payload = jsonable_encoder(payload)
+    if output == "none":
+        return JSONResponse(content=payload)
+
+    if output == "thumbnail":
+        max_side = max_side or THUMBNAIL_MAX_SIDE
+        quality = quality or THUMBNAIL_JPEG_QUALITY
+    jpeg = await inference_executor.run(
+        render_prepared_jpeg, image, boxes, labels, max_side, quality or ANNOTATION_JPEG_QUALITY
+    )
+
+    if output == "jpeg":
+        return Response(content=jpeg, media_type="image/jpeg",
+                        headers={"X-Analysis": analysis_header(payload)})
+    if output == "multipart":
+        return _multipart(payload, jpeg)
+
+    payload[image_key] = f"data:image/jpeg;base64,{base64.b64encode(jpeg).decode('utf-8')}"
+    return JSONResponse(content=payload)
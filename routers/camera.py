@@ -1,37 +1,55 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, WebSocket
+import asyncio
+import os
+import time
+import uuid
+
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-from typing import Dict, List
-import cv2
-import numpy as np
-import base64
-import io
-from PIL import Image
+from typing import Dict, List, Optional
 
-from services.emotion_cnn_model import EmotionCNNModel
+from services.face_model import DetectionPresetName
+from services.model_registry import get_model
+from routers.annotation_output import AnnotationOutput, annotated_response, negotiate_output
+from routers.frame_input import image_request_body, read_image
+from services.vision_pipeline import analysis_boxes_and_labels, analyze_frame, analyze_frames, inference_executor, prepare_image
 
 router = APIRouter()
-emotion_model = EmotionCNNModel(model_path='models/emotion_model.h5')
+
+# Jumlah frame maksimum per request /camera/batch-analyze-frames
+CAMERA_BATCH_MAX_FRAMES = int(os.environ.get("CAMERA_BATCH_MAX_FRAMES", 100))
 
 
 class CameraFrameRequest(BaseModel):
     frame: str  # base64 encoded image
+    preset: Optional[DetectionPresetName] = None  # preset deteksi wajah, default dari FACE_DETECTION_PRESET
+    session_id: Optional[str] = None  # id stream kamera, aktifkan face tracking antar frame
 
 
 class CameraAnalysisResponse(BaseModel):
     success: bool
     faces_detected: int
     faces: List[Dict]
+    tracking: Optional[Dict] = None
+    cached: bool = False  # true jika frame near-duplicate dan hasil frame sebelumnya dipakai ulang
 
 
-@router.post("/camera/analyze-frame", response_model=CameraAnalysisResponse)
-async def analyze_camera_frame(data: CameraFrameRequest):
+@router.post("/camera/analyze-frame", response_model=CameraAnalysisResponse,
+             openapi_extra=image_request_body(CameraFrameRequest))
+async def analyze_camera_frame(
+    request: Request,
+    preset: Optional[DetectionPresetName] = Query(None),
+    session_id: Optional[str] = Query(None)
+):
     """
     Analyze single frame dari webcam
     
-    Request:
+    Request (JSON):
     {
-        "frame": "base64_encoded_image_data"
+        "frame": "base64_encoded_image_data",
+        "session_id": "opsional, id stream untuk face tracking"
     }
+    atau body JPEG/PNG mentah (Content-Type image/jpeg, image/png,
+    application/octet-stream) dengan preset & session_id di query string.
     
     Response:
     {
@@ -50,21 +68,16 @@ async def analyze_camera_frame(data: CameraFrameRequest):
     }
     """
     try:
-        # Decode base64
-        if data.frame.startswith("data:image"):
-            frame_data = data.frame.split(",")[1]
-        else:
-            frame_data = data.frame
-        
-        image_bytes = base64.b64decode(frame_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # Decode body mentah / base64 JSON ke grayscale (di inference executor)
+        frame, data = await read_image(request, CameraFrameRequest, preset=preset)
         
         if frame is None:
             raise HTTPException(status_code=400, detail="Invalid frame data")
+        if data is not None:
+            preset, session_id = data.preset or preset, data.session_id or session_id
         
         # Analyze frame
-        result = emotion_model.analyze_frame(frame)
+        result = await analyze_frame(get_model("emotion_cnn"), frame, preset, session_id)
         
         return CameraAnalysisResponse(**result)
     
@@ -74,39 +87,38 @@ async def analyze_camera_frame(data: CameraFrameRequest):
         raise HTTPException(status_code=500, detail=f"Error analyzing frame: {str(e)}")
 
 
-@router.post("/camera/analyze-with-annotation")
-async def analyze_frame_with_annotation(data: CameraFrameRequest):
+@router.post("/camera/analyze-with-annotation", openapi_extra=image_request_body(CameraFrameRequest))
+async def analyze_frame_with_annotation(
+    request: Request,
+    preset: Optional[DetectionPresetName] = Query(None),
+    session_id: Optional[str] = Query(None),
+    output: Optional[AnnotationOutput] = Query(None, description="base64 / thumbnail / jpeg / multipart / none"),
+    quality: Optional[int] = Query(None, ge=10, le=100),
+    max_side: Optional[int] = Query(None, ge=32, le=4096)
+):
     """
     Analyze frame dan return annotated frame dengan boxes + emotion labels
+    (body JSON base64 atau JPEG/PNG mentah, sama seperti /camera/analyze-frame).
+    Format gambar anotasi dipilih lewat `output` / header Accept, lihat /vision/detect-emotion.
     """
     try:
-        # Decode base64
-        if data.frame.startswith("data:image"):
-            frame_data = data.frame.split(",")[1]
-        else:
-            frame_data = data.frame
-        
-        image_bytes = base64.b64decode(frame_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # Decode body (grayscale; warna hanya di-decode jika output butuh gambar)
+        frame, data = await read_image(request, CameraFrameRequest, preset=preset)
         
         if frame is None:
             raise HTTPException(status_code=400, detail="Invalid frame data")
+        if data is not None:
+            preset, session_id = data.preset or preset, data.session_id or session_id
         
         # Analyze
-        analysis = emotion_model.analyze_frame(frame)
-        
-        # Draw predictions
-        annotated = emotion_model.draw_predictions(frame, analysis)
+        analysis = await analyze_frame(get_model("emotion_cnn"), frame, preset, session_id)
         
-        # Encode to base64
-        _, buffer = cv2.imencode('.jpg', annotated)
-        frame_base64 = base64.b64encode(buffer).decode()
-        
-        return {
-            "analysis": analysis,
-            "annotated_frame": f"data:image/jpeg;base64,{frame_base64}"
-        }
+        # Draw predictions + encode (hanya jika output membutuhkan gambar)
+        boxes, labels = analysis_boxes_and_labels(analysis)
+        return await annotated_response(
+            {"analysis": analysis}, "annotated_frame", negotiate_output(request, output),
+            frame, boxes, labels, quality=quality, max_side=max_side
+        )
     
     except HTTPException:
         raise
@@ -117,44 +129,37 @@ async def analyze_frame_with_annotation(data: CameraFrameRequest):
 @router.post("/camera/batch-analyze-frames")
 async def batch_analyze_frames(frames: List[CameraFrameRequest]):
     """
-    Analyze multiple frames sekaligus
-    Max 10 frames
+    Analyze multiple frames sekaligus (maksimum CAMERA_BATCH_MAX_FRAMES, default 100).
+    Decode + deteksi berjalan paralel, semua wajah diklasifikasi dalam satu
+    forward pass CNN. `results` urut sesuai input; frame yang gagal berisi
+    {"frame_index": i, "success": false, "error": "..."}.
     """
     try:
-        if len(frames) > 10:
-            raise HTTPException(status_code=400, detail="Maximum 10 frames allowed")
+        if len(frames) > CAMERA_BATCH_MAX_FRAMES:
+            raise HTTPException(status_code=400, detail=f"Maximum {CAMERA_BATCH_MAX_FRAMES} frames allowed")
         
-        results = []
-        emotion_stats = {}
+        results = await analyze_frames(
+            get_model("emotion_cnn"),
+            [(frame_req.frame, frame_req.preset, frame_req.session_id) for frame_req in frames]
+        )
         
-        for frame_req in frames:
-            try:
-                if frame_req.frame.startswith("data:image"):
-                    frame_data = frame_req.frame.split(",")[1]
-                else:
-                    frame_data = frame_req.frame
-                
-                image_bytes = base64.b64decode(frame_data)
-                nparr = np.frombuffer(image_bytes, np.uint8)
-                frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                
-                if frame is not None:
-                    analysis = emotion_model.analyze_frame(frame)
-                    results.append(analysis)
-                    
-                    # Count emotions
-                    for face in analysis["faces"]:
-                        emotion = face["emotion"]
-                        emotion_stats[emotion] = emotion_stats.get(emotion, 0) + 1
-            
-            except:
+        # Count emotions
+        emotion_stats = {}
+        processed = 0
+        for analysis in results:
+            if not analysis["success"]:
                 continue
+            processed += 1
+            for face in analysis["faces"]:
+                emotion = face["emotion"]
+                emotion_stats[emotion] = emotion_stats.get(emotion, 0) + 1
         
-        if not results:
+        if not processed:
             raise HTTPException(status_code=400, detail="No valid frames processed")
         
         return {
-            "total_frames": len(results),
+            "total_frames": processed,
+            "failed_frames": len(results) - processed,
             "results": results,
             "emotion_distribution": emotion_stats
         }
@@ -165,23 +170,18 @@ async def batch_analyze_frames(frames: List[CameraFrameRequest]):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/camera/analyze-image-file")
-async def analyze_image_file(file: UploadFile = File(...)):
+@router.post("/camera/analyze-image-file", openapi_extra=image_request_body(multipart=True))
+async def analyze_image_file(request: Request, preset: Optional[DetectionPresetName] = Query(None)):
     """
-    Upload image file dan analyze
+    Upload image file (multipart field "file" atau body JPEG/PNG mentah) dan analyze
     """
     try:
-        if file.content_type not in ['image/jpeg', 'image/png', 'image/jpg']:
-            raise HTTPException(status_code=400, detail="Invalid image format")
-        
-        contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        frame, _ = await read_image(request, multipart=True, check_upload_type=True, preset=preset)
         
         if frame is None:
             raise HTTPException(status_code=400, detail="Could not read image")
         
-        result = emotion_model.analyze_frame(frame)
+        result = await analyze_frame(get_model("emotion_cnn"), frame, preset)
         
         return result
     
@@ -191,11 +191,126 @@ async def analyze_image_file(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class _LatestFrame:
+    """
+    Slot satu frame per koneksi WebSocket: frame baru menimpa frame yang
+    belum sempat diproses (dihitung sebagai dropped), jadi antrian tidak
+    pernah tumbuh dan latency dibatasi satu frame inference.
+    """
+
+    def __init__(self):
+        self._frame: Optional[bytes] = None
+        self._number = 0
+        self._received_at = 0.0
+        self._event = asyncio.Event()
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+
+    def put(self, data: bytes):
+        if self._frame is not None:
+            self.dropped += 1
+        self.received += 1
+        self._frame = data
+        self._number = self.received
+        self._received_at = time.perf_counter()
+        self._event.set()
+
+    async def take(self):
+        await self._event.wait()
+        self._event.clear()
+        frame, self._frame = self._frame, None
+        return frame, self._number, self._received_at
+
+    def counters(self) -> Dict:
+        return {"received": self.received, "processed": self.processed, "dropped": self.dropped}
+
+
+@router.websocket("/camera/ws")
+async def camera_stream(
+    websocket: WebSocket,
+    session_id: Optional[str] = None,
+    preset: Optional[DetectionPresetName] = None
+):
+    """
+    Streaming webcam lewat WebSocket.
+
+    Client mengirim frame JPEG/PNG sebagai pesan binary, server membalas
+    JSON untuk setiap frame yang diproses:
+    {
+        "type": "analysis",
+        "frame": 42,                  # nomor frame (urutan diterima)
+        "latency_ms": 35.2,           # dari frame diterima sampai hasil siap
+        "stats": {"received": 42, "processed": 30, "dropped": 12},
+        "success": true, "faces_detected": 1, "faces": [...], "tracking": {...}
+    }
+    Frame yang tidak bisa di-decode atau gagal dianalisis dibalas
+    {"type": "error", "frame": n, "detail": "..."} dan stream tetap berjalan.
+    Jika inference tertinggal, hanya frame terbaru yang diproses. Face tracking
+    aktif per koneksi (session_id opsional, default id acak).
+    """
+    await websocket.accept()
+    session_id = session_id or uuid.uuid4().hex
+    slot = _LatestFrame()
+
+    async def process_frames():
+        emotion_model = get_model("emotion_cnn")
+        while True:
+            data, number, received_at = await slot.take()
+            try:
+                frame = await inference_executor.run(prepare_image, data, preset)
+                analysis = None if frame is None else await analyze_frame(emotion_model, frame, preset, session_id)
+            except Exception as e:
+                # Satu frame rusak (mis. error cv2 / tracker) tidak boleh mematikan stream
+                print(f"❌ [Camera WS] {session_id} frame {number}: {e}")
+                await websocket.send_json({"type": "error", "frame": number, "detail": f"Error analyzing frame: {e}"})
+                continue
+            if analysis is None:
+                await websocket.send_json({"type": "error", "frame": number, "detail": "Invalid frame data"})
+                continue
+
+            slot.processed += 1
+            await websocket.send_json({
+                "type": "analysis",
+                "frame": number,
+                "latency_ms": round((time.perf_counter() - received_at) * 1000, 1),
+                "stats": slot.counters(),
+                **analysis
+            })
+
+    processor = asyncio.create_task(process_frames())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                slot.put(message["bytes"])
+            elif message.get("text") == "stats":
+                await websocket.send_json({"type": "stats", "session_id": session_id, **slot.counters()})
+            else:
+                await websocket.send_json({"type": "error", "detail": "Send frames as binary JPEG/PNG messages"})
+            if processor.done():
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        processor.cancel()
+        try:
+            await processor
+        except (asyncio.CancelledError, WebSocketDisconnect):
+            pass
+        except Exception as e:
+            print(f"❌ [Camera WS] {session_id}: {e}")
+        print(f"[Camera WS] {session_id} closed: {slot.counters()}")
+
+
 @router.get("/camera/emotions")
 async def get_emotions():
     """
     Get list of available emotions
     """
+    emotion_model = get_model("emotion_cnn")
     return {
         "emotions": emotion_model.emotion_labels,
         "emotions_en": emotion_model.emotion_labels_en
@@ -0,0 +1,166 @@
+import os
+import tempfile
+from typing import Optional, Tuple, Type
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+from services.vision_pipeline import PreparedImage, inference_executor, prepare_base64_image, prepare_image
+
+# Body gambar mentah: bytes request langsung ke cv2.imdecode (satu buffer, tanpa base64/JSON)
+RAW_IMAGE_TYPES = ("application/octet-stream", "image/jpeg", "image/jpg", "image/png")
+UPLOAD_IMAGE_TYPES = ("image/jpeg", "image/png", "image/jpg")
+
+
+def _content_type(request: Request) -> str:
+    return request.headers.get("content-type", "").split(";", 1)[0].strip().lower()
+
+
+def image_request_body(json_model: Optional[Type[BaseModel]] = None, multipart: bool = False) -> dict:
+    """openapi_extra untuk endpoint yang membaca gambar lewat read_image()"""
+    binary = {"schema": {"type": "string", "format": "binary"}}
+    content = {content_type: binary for content_type in RAW_IMAGE_TYPES}
+    if json_model is not None:
+        content["application/json"] = {"schema": json_model.model_json_schema()}
+    if multipart:
+        content["multipart/form-data"] = {
+            "schema": {"type": "object", "properties": {"file": binary["schema"]}, "required": ["file"]}
+        }
+    return {"requestBody": {"required": True, "content": content}}
+
+
+async def read_image(request: Request, json_model: Optional[Type[BaseModel]] = None,
+                     multipart: bool = False, check_upload_type: bool = False,
+                     preset: Optional[str] = None) -> Tuple[Optional[PreparedImage], Optional[BaseModel]]:
+    """
+    Baca gambar dari request sesuai Content-Type:
+      - image/jpeg, image/png, application/octet-stream : body mentah
+      - multipart/form-data (jika multipart=True)       : field "file"
+      - application/json (jika json_model diberikan)     : field base64 "frame"
+    Return (PreparedImage atau None jika tidak bisa di-decode, payload JSON atau None).
+    Gambar di-decode grayscale (reduced sesuai `preset`, atau preset di payload
+    JSON) di inference executor; warna baru di-decode jika anotasi diminta.
+    """
+    content_type = _content_type(request)
+
+    if content_type in RAW_IMAGE_TYPES:
+        body = await request.body()
+        return await inference_executor.run(prepare_image, body, preset), None
+
+    if multipart and content_type == "multipart/form-data":
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Missing image file field 'file'")
+        if check_upload_type and upload.content_type not in UPLOAD_IMAGE_TYPES:
+            raise HTTPException(status_code=400, detail="Invalid image format")
+        contents = await upload.read()
+        return await inference_executor.run(prepare_image, contents, preset), None
+
+    if json_model is not None and content_type in ("application/json", ""):
+        try:
+            payload = json_model.model_validate_json(await request.body())
+        except ValidationError as e:
+            # Format sama dengan error validasi body bawaan FastAPI
+            errors = e.errors(include_url=False, include_context=False)
+            raise HTTPException(status_code=422, detail=[{**err, "loc": ["body", *err["loc"]]} for err in errors])
+        preset = getattr(payload, "preset", None) or preset
+        return await inference_executor.run(prepare_base64_image, payload.frame, preset), payload
+
+    accepted = list(RAW_IMAGE_TYPES)
+    if multipart:
+        accepted.append("multipart/form-data")
+    if json_model is not None:
+        accepted.append("application/json")
+    raise HTTPException(status_code=415, detail=f"Unsupported Content-Type '{content_type}', use one of {accepted}")
+
+
+# --- Upload video: di-spool ke file sementara (cv2.VideoCapture butuh path) ---
+VIDEO_MAX_BYTES = int(os.environ.get("VIDEO_MAX_BYTES", 512 * 2**20))
+RAW_VIDEO_TYPES = ("application/octet-stream", "video/mp4", "video/quicktime", "video/x-msvideo", "video/webm",
+                   "video/x-matroska")
+_SPOOL_CHUNK = 1 << 20
+# Ruang untuk boundary + header part di body multipart
+_MULTIPART_OVERHEAD = 64 * 1024
+
+
+def video_request_body() -> dict:
+    binary = {"schema": {"type": "string", "format": "binary"}}
+    content = {content_type: binary for content_type in RAW_VIDEO_TYPES}
+    content["multipart/form-data"] = {
+        "schema": {"type": "object", "properties": {"file": binary["schema"]}, "required": ["file"]}
+    }
+    return {"requestBody": {"required": True, "content": content}}
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Video larger than {max_bytes} bytes")
+
+
+async def _limited_stream(request: Request, max_bytes: int, limit: int):
+    """Body request per chunk; 413 begitu melebihi `limit` byte (sebelum ditulis ke disk)"""
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > limit:
+            raise _too_large(max_bytes)
+        yield chunk
+
+
+def _copy_to_file(source, destination: str, max_bytes: int) -> int:
+    written = 0
+    with open(destination, "wb") as out:
+        while True:
+            chunk = source.read(_SPOOL_CHUNK)
+            if not chunk:
+                return written
+            written += len(chunk)
+            if written > max_bytes:
+                raise _too_large(max_bytes)
+            out.write(chunk)
+
+
+async def spool_video(request: Request, max_bytes: int = VIDEO_MAX_BYTES) -> str:
+    """
+    Simpan video dari request (multipart field "file" atau body mentah) ke file
+    sementara per chunk, tanpa memuat seluruh video ke memori. Body yang
+    melebihi max_bytes ditolak (413) dari Content-Length atau saat streaming,
+    sebelum ditulis ke disk. Caller wajib menghapus file-nya.
+    """
+    content_type = _content_type(request)
+    limit = max_bytes + _MULTIPART_OVERHEAD if content_type == "multipart/form-data" else max_bytes
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > limit:
+        raise _too_large(max_bytes)
+
+    fd, path = tempfile.mkstemp(prefix="video-", suffix=".bin")
+    os.close(fd)
+    try:
+        if content_type == "multipart/form-data":
+            # Parser multipart Starlette dengan stream yang dibatasi: request.form()
+            # akan men-spool seluruh upload dulu sebelum ukurannya bisa dicek
+            parser = MultiPartParser(request.headers, _limited_stream(request, max_bytes, limit), max_files=1)
+            try:
+                form = await parser.parse()
+            except MultiPartException as e:
+                raise HTTPException(status_code=400, detail=e.message)
+            try:
+                upload = form.get("file")
+                if upload is None or isinstance(upload, str):
+                    raise HTTPException(status_code=400, detail="Missing video file field 'file'")
+                await run_in_threadpool(_copy_to_file, upload.file, path, max_bytes)
+            finally:
+                await form.close()
+        elif content_type in RAW_VIDEO_TYPES:
+            with open(path, "wb") as out:
+                async for chunk in _limited_stream(request, max_bytes, max_bytes):
+                    await run_in_threadpool(out.write, chunk)
+        else:
+            accepted = list(RAW_VIDEO_TYPES) + ["multipart/form-data"]
+            raise HTTPException(status_code=415, detail=f"Unsupported Content-Type '{content_type}', use one of {accepted}")
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
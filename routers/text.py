@@ -1,14 +1,33 @@
-from fastapi import APIRouter, HTTPException
+import json
+import os
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
 from pydantic import BaseModel
-from services.text_model import TextEmotionModel
+from services.model_registry import get_model
+from services.text_model import LONG_TEXT_THRESHOLD
+from utils import text_processing
 from utils.text_processing import preprocess_text
 
 router = APIRouter()
-text_model = TextEmotionModel()
+
+# Mode model default: "rule" (rule_based) atau "linear" (hashing + classifier linear)
+TEXT_MODEL_MODES = ("rule", "linear")
+DEFAULT_TEXT_MODEL_MODE = os.environ.get("TEXT_MODEL_MODE", "rule")
+
+MAX_BATCH_TEXTS = int(os.environ.get("TEXT_MAX_BATCH_SIZE", 1000))
+# Jumlah baris per chunk saat streaming dan batas panjang satu baris (bytes)
+STREAM_CHUNK_LINES = int(os.environ.get("TEXT_STREAM_CHUNK_LINES", 256))
+STREAM_MAX_LINE_BYTES = int(os.environ.get("TEXT_STREAM_MAX_LINE_BYTES", 64 * 1024))
 
 
 class TextRequest(BaseModel):
     text: str
+    model: Optional[str] = None  # "rule" / "linear", default TEXT_MODEL_MODE
+    include_timeline: bool = False  # emosi per chunk (mode rule)
 
 
 class TextResponse(BaseModel):
@@ -18,22 +37,254 @@ class TextResponse(BaseModel):
     processed_text: str
 
 
+class TextBatchRequest(BaseModel):
+    texts: List[str]
+    model: Optional[str] = None
+
+
+class TextBatchResponse(BaseModel):
+    results: List[TextResponse]
+
+
+def _select_model(mode: Optional[str]):
+    explicit = mode is not None
+    mode = mode or DEFAULT_TEXT_MODEL_MODE
+    if mode not in TEXT_MODEL_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown model '{mode}', choose one of {list(TEXT_MODEL_MODES)}")
+    if mode == "linear":
+        linear_text_model = get_model("text_linear")
+        if linear_text_model.is_ready:
+            return linear_text_model
+        if explicit:
+            raise HTTPException(status_code=503, detail="Linear text model is not available")
+    # Default mode linear tapi artifact belum ada -> tetap jalan dengan rule based
+    return get_model("text_rule")
+
+
 @router.post("/analyze-text", response_model=TextResponse)
 async def analyze_text(request: TextRequest):
     try:
         if not request.text or len(request.text.strip()) == 0:
             raise HTTPException(status_code=400, detail="Text cannot be empty")
         
-        processed = preprocess_text(request.text)
-        emotion, confidence, scores = text_model.predict(processed)
+        model = _select_model(request.model)
+        # Teks mentah ke model: cache hit tidak perlu tokenisasi/TextDocument.
+        # Panjang mentah >= panjang setelah dibersihkan, predict_long sendiri
+        # kembali ke predict() jika ternyata pendek.
+        if model is get_model("text_rule") and (request.include_timeline or len(request.text) > LONG_TEXT_THRESHOLD):
+            # Dokumen panjang: map-reduce di process pool, event loop tidak ikut tertahan
+            emotion, confidence, scores = await run_in_threadpool(
+                model.predict_long, request.text, request.include_timeline
+            )
+        else:
+            emotion, confidence, scores = model.predict(request.text)
         
         return TextResponse(
             emotion=emotion,
             confidence=confidence,
             sentiment_scores=scores,
-            processed_text=processed
+            processed_text=preprocess_text(request.text)
         )
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/analyze-batch", response_model=TextBatchResponse)
+async def analyze_batch(request: TextBatchRequest):
+    """
+    Analisis banyak teks dalam satu request, hasil dikembalikan sesuai urutan input
+    """
+    try:
+        if not request.texts:
+            raise HTTPException(status_code=400, detail="Texts cannot be empty")
+        if len(request.texts) > MAX_BATCH_TEXTS:
+            raise HTTPException(status_code=400, detail=f"Maximum {MAX_BATCH_TEXTS} texts allowed")
+        for idx, text in enumerate(request.texts):
+            if not text or len(text.strip()) == 0:
+                raise HTTPException(status_code=400, detail=f"Text at index {idx} cannot be empty")
+        
+        model = _select_model(request.model)
+        predictions = await run_in_threadpool(model.predict_batch, request.texts)
+        
+        return TextBatchResponse(results=[
+            TextResponse(
+                emotion=emotion,
+                confidence=confidence,
+                sentiment_scores=scores,
+                processed_text=preprocess_text(text)
+            )
+            for text, (emotion, confidence, scores) in zip(request.texts, predictions)
+        ])
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse tanpa task listen_for_disconnect terpisah. Generator-nya
+    sendiri membaca body request, dan listener bawaan akan ikut mengambil
+    pesan body dari receive(). Disconnect tetap terdeteksi lewat
+    request.stream() (ClientDisconnect) atau saat send gagal.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+async def _iter_lines(request: Request) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Baca body request baris per baris tanpa menampung seluruh body.
+    Baris yang melebihi STREAM_MAX_LINE_BYTES di-yield sebagai None.
+    """
+    buffer = b""
+    line_no = 0
+    oversized = False
+    
+    async for chunk in request.stream():
+        *lines, rest = (buffer + chunk).split(b"\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, None if oversized or len(line) > STREAM_MAX_LINE_BYTES else line
+            oversized = False
+        
+        # Buang isi baris yang kepanjangan, cukup ingat bahwa baris ini invalid
+        if len(rest) > STREAM_MAX_LINE_BYTES:
+            rest = b""
+            oversized = True
+        buffer = rest
+    
+    if buffer or oversized:
+        yield line_no + 1, None if oversized else buffer
+
+
+def _parse_stream_line(line: bytes, is_ndjson: bool) -> Tuple[Optional[str], Optional[object]]:
+    """Return (text, id) dari satu baris input, text None jika baris kosong"""
+    decoded = line.decode("utf-8", errors="replace").strip()
+    if not decoded:
+        return None, None
+    if not is_ndjson:
+        return decoded, None
+    
+    item = json.loads(decoded)
+    if isinstance(item, str):
+        return item, None
+    if isinstance(item, dict) and isinstance(item.get("text"), str):
+        return item["text"], item.get("id")
+    raise ValueError("Each line must be a JSON string or an object with a 'text' field")
+
+
+async def _analyze_stream(request: Request, is_ndjson: bool, model) -> AsyncIterator[bytes]:
+    # (line_no, id, text, processed_text, error) -- error ikut masuk chunk supaya output tetap urut
+    chunk: List[Tuple[int, object, Optional[str], Optional[str], Optional[str]]] = []
+    
+    async def flush() -> List[bytes]:
+        texts = [text for _, _, text, _, error in chunk if error is None]
+        predictions = iter(await run_in_threadpool(model.predict_batch, texts) if texts else [])
+        
+        lines = []
+        for line_no, item_id, _, processed_text, error in chunk:
+            result = {"line": line_no}
+            if item_id is not None:
+                result["id"] = item_id
+            if error is not None:
+                result["error"] = error
+            else:
+                emotion, confidence, scores = next(predictions)
+                result.update(
+                    emotion=emotion,
+                    confidence=confidence,
+                    sentiment_scores=scores,
+                    processed_text=processed_text
+                )
+            lines.append(json.dumps(result, ensure_ascii=False).encode("utf-8") + b"\n")
+        chunk.clear()
+        return lines
+    
+    async for line_no, line in _iter_lines(request):
+        if line is None:
+            chunk.append((line_no, None, None, None, f"Line exceeds {STREAM_MAX_LINE_BYTES} bytes"))
+        else:
+            try:
+                text, item_id = _parse_stream_line(line, is_ndjson)
+            except ValueError as e:
+                chunk.append((line_no, None, None, None, str(e)))
+            else:
+                if text is None:
+                    continue
+                # Cukup teks yang dibersihkan untuk filter baris kosong, TextDocument
+                # hanya dibangun model untuk teks yang tidak ada di cache
+                processed_text = preprocess_text(text)
+                if not processed_text:
+                    continue
+                chunk.append((line_no, item_id, text, processed_text, None))
+        
+        if len(chunk) >= STREAM_CHUNK_LINES:
+            for result_line in await flush():
+                yield result_line
+    
+    if chunk:
+        for result_line in await flush():
+            yield result_line
+
+
+@router.post("/analyze-stream")
+async def analyze_stream(request: Request, model: Optional[str] = None):
+    """
+    Bulk analysis via streaming: body NDJSON (application/x-ndjson, satu JSON string
+    atau {"text": ..., "id": ...} per baris) atau plain text (satu teks per baris).
+    Hasil dikirim balik sebagai NDJSON per chunk begitu selesai diproses,
+    jadi memory tetap konstan berapapun besar inputnya.
+    Pilihan model lewat query ?model=rule|linear.
+    """
+    selected_model = _select_model(model)
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    is_ndjson = content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json")
+    
+    return BodyStreamingResponse(
+        _analyze_stream(request, is_ndjson, selected_model),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.get("/cache-stats")
+async def cache_stats():
+    """
+    Statistik cache koreksi token dan cache prediksi (hit/miss/eviction)
+    """
+    return get_model("text_rule").cache_stats()
+
+
+@router.get("/lexicon")
+async def lexicon_info():
+    """
+    Info lexicon yang sedang aktif (versi, jumlah keyword, dll)
+    """
+    return text_processing.get_lexicon().info()
+
+
+@router.post("/lexicon/reload")
+async def reload_lexicon():
+    """
+    Hot reload artifact lexicon dari TEXT_LEXICON_PATH tanpa restart.
+    Artifact di-load di threadpool lalu di-swap secara atomic; request yang
+    sedang berjalan tetap selesai dengan lexicon lama.
+    """
+    try:
+        previous = text_processing.get_lexicon().version
+        lexicon = await run_in_threadpool(text_processing.reload_lexicon)
+        return {"previous_version": previous, "lexicon": lexicon.info()}
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Lexicon file not found: {text_processing.LEXICON_PATH}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
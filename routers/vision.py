@@ -1,35 +1,47 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
-import cv2
-import numpy as np
-import base64
+import json
+import os
+from typing import Optional
 
-# Import Service
-from services.face_model import FaceDetectionService
-from services.emotion_cnn_model import EmotionCNNModel # Class yang baru kita buat
+import anyio
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 
-router = APIRouter(prefix="/vision", tags=["Vision"])
+# Import Service (model diambil dari registry, di-load saat pertama dipakai)
+from routers.annotation_output import AnnotationOutput, annotated_response, negotiate_output
+from routers.frame_input import image_request_body, read_image, spool_video, video_request_body
+from services.face_model import DetectionPresetName
+from services.model_registry import get_model
+from services.video_pipeline import VIDEO_MAX_FRAMES, VIDEO_SAMPLE_FPS, analyze_video, probe_video
+from services.vision_pipeline import detect_faces, face_trackers, frame_dedupe, inference_executor
 
-# Initialize services
-face_detector = FaceDetectionService()
-emotion_recognizer = EmotionCNNModel()
+router = APIRouter(prefix="/vision", tags=["Vision"])
 
-@router.post("/detect-emotion")
-async def detect_emotion(file: UploadFile = File(...)):
+@router.post("/detect-emotion", openapi_extra=image_request_body(multipart=True))
+async def detect_emotion(
+    request: Request,
+    preset: Optional[DetectionPresetName] = Query(None, description="Preset deteksi wajah: fast / balanced / accurate"),
+    output: Optional[AnnotationOutput] = Query(None, description="base64 / thumbnail / jpeg / multipart / none"),
+    quality: Optional[int] = Query(None, ge=10, le=100, description="Kualitas JPEG gambar anotasi"),
+    max_side: Optional[int] = Query(None, ge=32, le=4096, description="Sisi terpanjang gambar anotasi (px)")
+):
     """
     Menerima gambar upload, mendeteksi wajah, dan memprediksi emosi menggunakan CNN.
+    Body: multipart field "file" atau JPEG/PNG mentah (image/jpeg, image/png, application/octet-stream).
+
+    Gambar anotasi sesuai `output` (atau header Accept): base64 di JSON (default),
+    thumbnail, body image/jpeg, multipart/mixed, atau none (hanya box, tanpa encode).
     """
     try:
         # 1. Baca Gambar dari Upload
-        contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # Decode, deteksi dan encode dijalankan di inference executor, bukan di event loop
+        image, _ = await read_image(request, multipart=True, preset=preset)
         
         if image is None:
             raise HTTPException(status_code=400, detail="Invalid image file")
         
-        # 2. Deteksi Lokasi Wajah
-        faces = face_detector.detect_faces(image)
+        # 2. Deteksi Lokasi Wajah (di buffer grayscale, box dipetakan ke koordinat asli)
+        faces = await inference_executor.run(detect_faces, image.gray, preset, image.scale)
         
         if len(faces) == 0:
             return JSONResponse(content={
@@ -38,41 +50,89 @@ async def detect_emotion(file: UploadFile = File(...)):
                 "faces": []
             })
         
-        results = []
+        # 3. Prediksi emosi semua wajah sekaligus (satu forward pass CNN)
+        emotion_results = await get_model("emotion_cnn").predict_emotions_async(image.gray, faces)
+        faces = faces * image.scale
         
-        # 3. Loop setiap wajah yang ketemu
-        for idx, (x, y, w, h) in enumerate(faces):
-            # Extract/Crop bagian wajah saja
-            # (Pastikan method extract_face ada di FaceDetectionService Anda)
-            face_img = image[y:y+h, x:x+w]
-            
-            # 4. Prediksi Emosi menggunakan CNN Model
-            emotion_result = emotion_recognizer.predict_emotion(face_img)
-            
-            # (Opsional) Gambar kotak di foto asli untuk dikirim balik
-            cv2.rectangle(image, (x, y), (x+w, y+h), (0, 255, 0), 2)
-            cv2.putText(image, f"{emotion_result['emotion']}", (x, y-10), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-            
+        results = []
+        for idx, ((x, y, w, h), emotion_result) in enumerate(zip(faces, emotion_results)):
             results.append({
                 "face_id": idx,
                 "box": {"x": int(x), "y": int(y), "w": int(w), "h": int(h)},
                 "emotion": emotion_result['emotion'],
                 "confidence": emotion_result['confidence'],
-                "all_scores": emotion_result['all_probabilities']
+                "all_scores": emotion_result.get('all_probabilities', [])
             })
         
-        # Convert gambar hasil anotasi ke Base64 (untuk preview di frontend)
-        _, buffer = cv2.imencode('.jpg', image)
-        img_base64 = base64.b64encode(buffer).decode('utf-8')
-        
-        return JSONResponse(content={
-            "success": True,
-            "message": f"Detected {len(faces)} face(s)",
-            "faces": results,
-            "annotated_image": f"data:image/jpeg;base64,{img_base64}"
-        })
+        # Gambar kotak + encode hanya jika format output membutuhkan gambar (untuk preview di frontend)
+        return await annotated_response(
+            {
+                "success": True,
+                "message": f"Detected {len(faces)} face(s)",
+                "faces": results
+            },
+            "annotated_image",
+            negotiate_output(request, output),
+            image, faces, [r['emotion'] for r in emotion_results],
+            quality=quality, max_side=max_side
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error Vision API: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/analyze-video", openapi_extra=video_request_body())
+async def analyze_video_file(
+    request: Request,
+    sample_fps: float = Query(VIDEO_SAMPLE_FPS, gt=0, le=60, description="Frame yang dianalisis per detik video"),
+    preset: Optional[DetectionPresetName] = Query(None, description="Preset deteksi wajah: fast / balanced / accurate"),
+    max_frames: int = Query(VIDEO_MAX_FRAMES, ge=1, le=VIDEO_MAX_FRAMES, description="Jumlah frame sampel maksimum")
+):
+    """
+    Analisis emosi file video (multipart field "file" atau body video mentah).
+    Video di-spool ke disk, frame disampel `sample_fps` kali per detik lalu
+    diproses pipeline decode -> deteksi -> inference batch.
+
+    Response NDJSON (satu JSON per baris, dikirim bertahap):
+    {"type": "frame", "timestamp": 1.5, "frame_index": 45, "dominant_emotion": "Senang", "faces": [...], ...}
+    ...
+    {"type": "summary", "frames_analyzed": 60, "emotion_distribution": {...}, "throughput_fps": 41.2, "memory": {...}}
+    """
+    path = await spool_video(request)
+    info = await run_in_threadpool(probe_video, path)
+    if info is None:
+        os.unlink(path)
+        raise HTTPException(status_code=400, detail="Could not read video")
+
+    async def timeline():
+        results = analyze_video(path, sample_fps=sample_fps, preset=preset, max_frames=max_frames)
+        try:
+            while True:
+                item = await run_in_threadpool(next, results, None)
+                if item is None:
+                    break
+                yield json.dumps(item) + "\n"
+        finally:
+            # Client putus -> task di-cancel: tetap hentikan stage (join di threadpool,
+            # bukan di event loop / GC) dan hapus file spool
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(results.close)
+                await run_in_threadpool(os.unlink, path)
+
+    return StreamingResponse(timeline(), media_type="application/x-ndjson")
+
+
+@router.get("/metrics")
+async def vision_metrics():
+    """Statistik micro-batching CNN, inference executor, face tracking dan dedupe frame kamera"""
+    emotion_recognizer = get_model("emotion_cnn")
+    return {
+        "emotion_cnn_backend": emotion_recognizer.backend_info(),
+        "emotion_cnn_batcher": emotion_recognizer.batch_stats(),
+        "inference_executor": inference_executor.stats(),
+        "face_tracking": face_trackers.stats(),
+        "frame_dedupe": frame_dedupe.stats(),
+    }
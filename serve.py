@@ -0,0 +1,281 @@
+"""
+Launcher production pre-fork. Lexicon, model teks dan Haar cascade di-load
+sekali di proses induk, lalu N worker uvicorn di-fork dan berbagi memori
+read-only tersebut lewat copy-on-write. Semua worker menerima koneksi dari
+satu socket yang dibuka induk.
+
+    python serve.py --workers 4 --port 8000
+    kill -HUP <pid induk>    # reload lexicon lalu restart worker bergiliran
+    kill -TERM <pid induk>   # graceful shutdown semua worker
+
+Runtime TensorFlow / ONNX Runtime tidak fork-safe (thread pool internalnya
+hilang setelah fork dan inference di worker akan hang), jadi untuk CNN induk
+hanya meng-import library-nya; model CNN dibangun tiap worker setelah fork,
+sebelum worker mulai menerima request.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+from utils import worker_health
+
+
+# Model yang aman di-load sebelum fork (struktur Python / numpy / OpenCV murni)
+FORK_SAFE_MODELS = ("text_rule", "text_linear", "face_detector")
+# Model dengan runtime yang harus dibuat ulang di setiap worker
+POST_FORK_MODELS = ("emotion_cnn",)
+
+
+class WorkerServer(uvicorn.Server):
+    """uvicorn.Server yang mengirim heartbeat ke induk dari event loop-nya"""
+
+    async def on_tick(self, counter: int) -> bool:
+        worker_health.beat()
+        return await super().on_tick(counter)
+
+
+def log(message: str):
+    print(f"[serve {os.getpid()}] {message}", flush=True)
+
+
+def preload(models):
+    from services.cnn_backends import import_backend_runtime
+    from services.emotion_cnn_model import CNN_BACKEND
+    from services.model_registry import registry
+
+    start = time.perf_counter()
+    for name in models:
+        if name in FORK_SAFE_MODELS:
+            registry.get(name)
+        elif name == "emotion_cnn":
+            import_backend_runtime(CNN_BACKEND)
+    log(f"Preloaded {', '.join(models) or '-'} in {time.perf_counter() - start:.1f}s")
+
+
+def create_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(slot: int, sock: socket.socket, args, models):
+    # Handler sinyal milik induk tidak berlaku di worker; uvicorn memasang miliknya sendiri
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    if hasattr(signal, "SIGHUP"):
+        from main import _reload_lexicon_on_signal
+        signal.signal(signal.SIGHUP, _reload_lexicon_on_signal)
+
+    worker_health.set_current_slot(slot)
+    worker_health.beat()
+
+    from services.model_registry import registry
+    for name in models:
+        if name in POST_FORK_MODELS:
+            registry.get(name)
+
+    from main import app
+    config = uvicorn.Config(
+        app,
+        loop=args.loop,
+        http=args.http,
+        log_level=args.log_level,
+        access_log=args.access_log,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+    WorkerServer(config).run(sockets=[sock])
+
+
+class Supervisor:
+    def __init__(self, sock: socket.socket, args, models):
+        self.sock = sock
+        self.args = args
+        self.models = models
+        self.workers = {}  # slot -> pid
+        self.restarts = [0] * args.workers
+        self.started_at = [0.0] * args.workers
+        self.shutting_down = False
+        self.reload_requested = False
+
+    def spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                run_worker(slot, self.sock, self.args, self.models)
+            except BaseException as e:
+                print(f"❌ [serve] Worker {slot} crashed: {e}", flush=True)
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+
+        self.workers[slot] = pid
+        self.started_at[slot] = time.time()
+        worker_health.set_worker(slot, pid, self.restarts[slot])
+        log(f"Worker {slot} started (pid {pid})")
+
+    def stop(self, slot: int, wait: bool = True):
+        pid = self.workers.get(slot)
+        if pid is None:
+            return
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        if not wait:
+            return
+
+        deadline = time.time() + self.args.graceful_timeout + 5
+        while time.time() < deadline:
+            done, _ = os.waitpid(pid, os.WNOHANG)
+            if done:
+                break
+            time.sleep(0.1)
+        else:
+            log(f"Worker {slot} (pid {pid}) did not stop in time, killing")
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.workers.pop(slot, None)
+
+    def reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = next((s for s, p in self.workers.items() if p == pid), None)
+            if slot is None:
+                continue
+            del self.workers[slot]
+            if self.shutting_down:
+                continue
+
+            log(f"Worker {slot} (pid {pid}) exited with status {status}, restarting")
+            # Worker yang langsung mati lagi (crash loop) diberi jeda sebelum di-fork ulang
+            if time.time() - self.started_at[slot] < 5:
+                time.sleep(1)
+            self.restarts[slot] += 1
+            self.spawn(slot)
+
+    def check_heartbeats(self):
+        for slot, pid in list(self.workers.items()):
+            age = worker_health.heartbeat_age(slot)
+            if age > self.args.worker_timeout:
+                log(f"Worker {slot} (pid {pid}) unresponsive for {age:.0f}s, killing")
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def rolling_restart(self):
+        """Reload lexicon di induk lalu ganti worker satu per satu (worker lain tetap melayani)"""
+        from utils.text_processing import LEXICON_PATH, reload_lexicon
+
+        if os.path.exists(LEXICON_PATH):
+            try:
+                lexicon = reload_lexicon()
+                log(f"Lexicon reloaded: {lexicon.version}")
+            except Exception as e:
+                log(f"❌ Lexicon reload failed: {e}")
+        gc.freeze()
+
+        for slot in list(self.workers):
+            if self.shutting_down:
+                return
+            self.stop(slot)
+            self.restarts[slot] += 1
+            self.spawn(slot)
+        log("Rolling restart complete")
+
+    def run(self):
+        def request_shutdown(signum, frame):
+            self.shutting_down = True
+
+        def request_reload(signum, frame):
+            self.reload_requested = True
+
+        signal.signal(signal.SIGTERM, request_shutdown)
+        signal.signal(signal.SIGINT, request_shutdown)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, request_reload)
+
+        for slot in range(self.args.workers):
+            self.spawn(slot)
+
+        while not self.shutting_down:
+            self.reap()
+            self.check_heartbeats()
+            if self.reload_requested:
+                self.reload_requested = False
+                self.rolling_restart()
+            time.sleep(0.5)
+
+        log("Shutting down workers")
+        for slot in list(self.workers):
+            self.stop(slot, wait=False)
+        deadline = time.time() + self.args.graceful_timeout + 5
+        while self.workers and time.time() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self.workers = {s: p for s, p in self.workers.items() if p != pid}
+            else:
+                time.sleep(0.1)
+        for pid in self.workers.values():
+            os.kill(pid, signal.SIGKILL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork multi-worker launcher")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--loop", default=os.environ.get("UVICORN_LOOP", "auto"), help="auto = uvloop jika terpasang")
+    parser.add_argument("--http", default=os.environ.get("UVICORN_HTTP", "auto"), help="auto = httptools jika terpasang")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.environ.get("GRACEFUL_TIMEOUT", 30)))
+    parser.add_argument("--worker-timeout", type=int, default=int(os.environ.get("WORKER_TIMEOUT", 60)),
+                        help="Worker tanpa heartbeat selama ini (detik) di-kill dan di-restart")
+    parser.add_argument("--preload", default=os.environ.get("PRELOAD_MODELS", ",".join(FORK_SAFE_MODELS + POST_FORK_MODELS)),
+                        help="Daftar model dipisah koma, kosong = tidak ada")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--no-access-log", dest="access_log", action="store_false")
+    args = parser.parse_args()
+
+    models = [name.strip() for name in args.preload.split(",") if name.strip()]
+    # Startup hook main.py di worker memakai daftar yang sama
+    os.environ["PRELOAD_MODELS"] = args.preload
+
+    # Import app dulu supaya lexicon + semua modul sudah ada di memori induk
+    import main as app_module  # noqa: F401
+    preload(models)
+
+    sock = create_socket(args.host, args.port, args.backlog)
+    worker_health.init_table(args.workers)
+
+    # Objek yang sudah ada dikeluarkan dari GC generasional, sehingga page-nya
+    # tidak ter-copy di worker hanya karena dikunjungi GC
+    gc.collect()
+    gc.freeze()
+
+    log(f"Listening on {args.host}:{args.port} with {args.workers} workers")
+    Supervisor(sock, args, models).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
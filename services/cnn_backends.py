@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+from typing import Dict
+
+import numpy as np
+
+
+# Backend inference CNN emosi. "keras" memakai runtime TensorFlow penuh,
+# "tflite" / "onnx" me-load model hasil export_emotion_model.py dengan
+# interpreter ringan (TensorFlow tidak perlu di-import sama sekali).
+CNN_BACKENDS = ("keras", "tflite", "onnx")
+
+DEFAULT_BACKEND_PATHS = {
+    "tflite": os.path.join("models", "emotion_cnn_fp16.tflite"),
+    "onnx": os.path.join("models", "emotion_cnn.onnx"),
+}
+
+
+def _load_tflite_interpreter_class():
+    # Urutan: runtime LiteRT/tflite_runtime yang ringan, terakhir tf.lite bawaan TensorFlow
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+class KerasBackend:
+    name = "keras"
+
+    def __init__(self, model):
+        self.model = model
+        self.path = None
+        self.load_seconds = 0.0
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # predict_on_batch tanpa overhead pipeline data dari predict()
+        return np.asarray(self.model.predict_on_batch(batch))
+
+    def info(self) -> Dict:
+        return {"backend": self.name, "path": self.path, "load_seconds": round(self.load_seconds, 3)}
+
+
+class TFLiteBackend:
+    """
+    Interpreter TFLite (float16 / int8 dengan input-output float32).
+    Tensor input di-resize hanya saat ukuran batch berubah.
+    """
+
+    name = "tflite"
+
+    def __init__(self, path: str, num_threads: int = None):
+        start = time.perf_counter()
+        interpreter_class = _load_tflite_interpreter_class()
+        self.path = path
+        self.interpreter = interpreter_class(model_path=path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output_index = self.interpreter.get_output_details()[0]["index"]
+        self._batch_size = int(self._input["shape"][0])
+        # Interpreter tidak thread-safe
+        self._lock = threading.Lock()
+        self.load_seconds = time.perf_counter() - start
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input["index"], list(batch.shape))
+                self.interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self.interpreter.set_tensor(self._input["index"], batch)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output_index).copy()
+
+    def info(self) -> Dict:
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "load_seconds": round(self.load_seconds, 3),
+            "file_bytes": os.path.getsize(self.path),
+        }
+
+
+class ONNXBackend:
+    name = "onnx"
+
+    def __init__(self, path: str, num_threads: int = None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("onnxruntime is not installed, `pip install onnxruntime` to use CNN_BACKEND=onnx")
+
+        start = time.perf_counter()
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.path = path
+        self.session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_name = self.session.get_inputs()[0].name
+        self.load_seconds = time.perf_counter() - start
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        return self.session.run(None, {self._input_name: batch})[0]
+
+    def info(self) -> Dict:
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "load_seconds": round(self.load_seconds, 3),
+            "file_bytes": os.path.getsize(self.path),
+        }
+
+
+def import_backend_runtime(name: str):
+    """
+    Import library runtime saja tanpa membuat model/session. Dipakai launcher
+    pre-fork: kode library ikut ter-share lewat copy-on-write, sedangkan
+    runtime (thread pool TF/ORT) baru dibuat di worker setelah fork.
+    """
+    if name == "keras":
+        import tensorflow  # noqa: F401
+    elif name == "tflite":
+        _load_tflite_interpreter_class()
+    elif name == "onnx":
+        import onnxruntime  # noqa: F401
+
+
+def load_backend(name: str, path: str = None, num_threads: int = None):
+    """Load backend hasil export. Raise FileNotFoundError jika file model tidak ada."""
+    if name not in ("tflite", "onnx"):
+        raise ValueError(f"Unknown CNN backend '{name}', choose one of {list(CNN_BACKENDS)}")
+    path = path or DEFAULT_BACKEND_PATHS[name]
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    if name == "tflite":
+        return TFLiteBackend(path, num_threads=num_threads)
+    return ONNXBackend(path, num_threads=num_threads)
@@ -1,18 +1,69 @@
-import tensorflow as tf
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense, Dropout, Flatten, Conv2D, MaxPooling2D
-from tensorflow.keras.optimizers import Adam
 import numpy as np
 import os
+import asyncio
+import time
 import cv2
 
+from services.cnn_backends import CNN_BACKENDS, KerasBackend, load_backend
+from services.vision_pipeline import inference_executor
+from utils.face_preprocessing import preprocess_face_batch
+from utils.micro_batcher import MicroBatcher
+
+# Backend inference: "keras" (default) atau model hasil export_emotion_model.py ("tflite" / "onnx")
+CNN_BACKEND = os.environ.get("CNN_BACKEND", "keras")
+CNN_BACKEND_PATH = os.environ.get("CNN_BACKEND_PATH")
+CNN_NUM_THREADS = int(os.environ.get("CNN_NUM_THREADS", 0)) or None
+
+# Micro-batching lintas request: crop wajah dari semua request digabung jadi satu forward pass
+CNN_MICRO_BATCHING = os.environ.get("CNN_MICRO_BATCHING", "1") != "0"
+CNN_BATCH_MAX_SIZE = int(os.environ.get("CNN_BATCH_MAX_SIZE", 32))
+CNN_BATCH_MAX_WAIT_MS = float(os.environ.get("CNN_BATCH_MAX_WAIT_MS", 5))
+CNN_BATCH_MAX_QUEUE = int(os.environ.get("CNN_BATCH_MAX_QUEUE", 1024))
+
+
 class EmotionCNNModel:
-    def __init__(self, model_path='models/model.h5'):
+    def __init__(self, model_path='models/model.h5', backend=None, backend_path=None):
+        self.model = None  # Model Keras, hanya dibangun untuk backend "keras"
+        self.backend = self._load_backend(model_path, backend or CNN_BACKEND, backend_path or CNN_BACKEND_PATH)
+        self.emotion_labels = {0: "Marah", 1: "Jijik", 2: "Takut", 3: "Senang", 4: "Netral", 5: "Sedih", 6: "Terkejut"}
+        self.emotion_labels_en = {0: "Angry", 1: "Disgust", 2: "Fear", 3: "Happy", 4: "Neutral", 5: "Sad", 6: "Surprise"}
+        self._emotion_ids = {label: idx for idx, label in self.emotion_labels.items()}
+        
+        self.batcher = None
+        if CNN_MICRO_BATCHING:
+            self.batcher = MicroBatcher(
+                self._predict_batch,
+                max_batch_size=CNN_BATCH_MAX_SIZE,
+                max_wait_ms=CNN_BATCH_MAX_WAIT_MS,
+                max_queue=CNN_BATCH_MAX_QUEUE,
+                name="emotion-cnn-batcher"
+            )
+
+    def _load_backend(self, model_path, backend_name, backend_path):
+        if backend_name not in CNN_BACKENDS:
+            raise ValueError(f"Unknown CNN backend '{backend_name}', choose one of {list(CNN_BACKENDS)}")
+        if backend_name != "keras":
+            try:
+                backend = load_backend(backend_name, backend_path, num_threads=CNN_NUM_THREADS)
+                print(f"✅ [EmotionCNN] {backend_name} model loaded from {backend.path} ({backend.load_seconds:.2f}s)")
+                return backend
+            except Exception as e:
+                print(f"❌ [EmotionCNN] Error loading {backend_name} backend: {e}, fallback ke Keras")
+
+        start = time.perf_counter()
         self.model = self._build_model()
         self.load_weights(model_path)
-        self.emotion_labels = {0: "Marah", 1: "Jijik", 2: "Takut", 3: "Senang", 4: "Netral", 5: "Sedih", 6: "Terkejut"}
+        backend = KerasBackend(self.model)
+        backend.path = model_path
+        backend.load_seconds = time.perf_counter() - start
+        return backend
 
     def _build_model(self):
+        # TensorFlow hanya di-import jika backend Keras benar-benar dipakai
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import Dense, Dropout, Flatten, Conv2D, MaxPooling2D
+        from tensorflow.keras.optimizers import Adam
+
         model = Sequential()
 
         model.add(Conv2D(32, kernel_size=(3, 3), activation='relu', input_shape=(48, 48, 1)))
@@ -52,35 +103,170 @@ class EmotionCNNModel:
         else:
             print(f"❌ [EmotionCNN] File not found: {full_path}")
 
+    def preprocess_face(self, face_image):
+        """
+        Crop wajah -> input model (48, 48, 1) float32 dengan skala 0-1
+        """
+        # 1. Preprocessing: Resize ke 48x48
+        roi = cv2.resize(face_image, (48, 48))
+        
+        # 2. Pastikan Grayscale (jika input masih BGR/RGB)
+        if len(roi.shape) == 3:
+            roi = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+
+        # 3. Normalisasi (0-1) - Penting! Karena training pakai rescale=1./255
+        roi = roi.astype('float32') / 255.0
+
+        # 4. Tambah channel
+        return np.expand_dims(roi, axis=-1)
+
+    def _predict_batch(self, batch):
+        return self.backend.predict(batch)
+
+    def _format_prediction(self, probabilities):
+        max_index = int(np.argmax(probabilities))
+        return {
+            "emotion": self.emotion_labels[max_index],
+            "confidence": float(probabilities[max_index]),
+            "all_probabilities": probabilities.tolist()
+        }
+
     def predict_emotion(self, face_image):
         """
         Menerima gambar wajah (crop) dan mengembalikan prediksi emosi.
+        Dengan micro-batching, caller menunggu sampai batch-nya selesai.
+        """
+        try:
+            roi = self.preprocess_face(face_image)
+            if self.batcher is not None:
+                probabilities = self.batcher.submit(roi).result()
+            else:
+                probabilities = self._predict_batch(roi[np.newaxis])[0]
+            return self._format_prediction(probabilities)
+        except Exception as e:
+            print(f"Error prediction: {e}")
+            return {"emotion": "Error", "confidence": 0.0}
+
+    async def predict_emotion_async(self, face_image):
         """
+        Versi async untuk endpoint: event loop tidak ditahan selama menunggu
+        batch, sehingga crop dari request lain bisa masuk batch yang sama.
+        """
+        if self.batcher is None:
+            # Forward pass sync, jangan di event loop
+            return await inference_executor.run_local(self.predict_emotion, face_image)
         try:
-            # 1. Preprocessing: Resize ke 48x48
-            roi = cv2.resize(face_image, (48, 48))
-            
-            # 2. Pastikan Grayscale (jika input masih BGR/RGB)
-            if len(roi.shape) == 3:
-                roi = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-
-            # 3. Normalisasi (0-1) - Penting! Karena training pakai rescale=1./255
-            roi = roi.astype('float32') / 255.0
-
-            # 4. Reshape untuk input model: (1, 48, 48, 1)
-            roi = np.expand_dims(roi, axis=-1) # Tambah channel
-            roi = np.expand_dims(roi, axis=0)  # Tambah batch
-
-            # 5. Prediksi
-            prediction = self.model.predict(roi, verbose=0)
-            max_index = int(np.argmax(prediction[0]))
-            confidence = float(prediction[0][max_index])
-
-            return {
-                "emotion": self.emotion_labels[max_index],
-                "confidence": confidence,
-                "all_probabilities": prediction[0].tolist()
-            }
+            roi = await inference_executor.run_local(self.preprocess_face, face_image)
+            probabilities = await asyncio.wrap_future(self.batcher.submit(roi))
+            return self._format_prediction(probabilities)
         except Exception as e:
             print(f"Error prediction: {e}")
-            return {"emotion": "Error", "confidence": 0.0}
\ No newline at end of file
+            return {"emotion": "Error", "confidence": 0.0}
+
+    def preprocess_faces(self, image, boxes):
+        """
+        Semua crop wajah (x, y, w, h) dari satu gambar -> satu array
+        (N, 48, 48, 1) float32, lihat preprocess_face_batch
+        """
+        return preprocess_face_batch(image, boxes)
+
+    def predict_emotions(self, image, boxes):
+        """
+        Prediksi emosi untuk banyak wajah dalam satu gambar dengan satu
+        forward pass. Return list dict (format sama dengan predict_emotion)
+        sesuai urutan boxes.
+        """
+        if len(boxes) == 0:
+            return []
+        try:
+            batch, invalid = self.preprocess_faces(image, boxes)
+            if self.batcher is not None:
+                # Satu unit di antrian -> satu forward pass bersama crop request lain
+                probabilities = self.batcher.submit_block(batch).result()
+            else:
+                probabilities = self._predict_batch(batch)
+            return self.format_predictions(probabilities, invalid)
+        except Exception as e:
+            print(f"Error prediction: {e}")
+            return [{"emotion": "Error", "confidence": 0.0} for _ in boxes]
+
+    async def predict_emotions_async(self, image, boxes):
+        """
+        Versi async predict_emotions: crop + resize di inference executor,
+        forward pass lewat micro-batcher (atau executor jika batcher mati).
+        """
+        if len(boxes) == 0:
+            return []
+        if self.batcher is None:
+            return await inference_executor.run_local(self.predict_emotions, image, boxes)
+        try:
+            batch, invalid = await inference_executor.run(preprocess_face_batch, image, boxes)
+            probabilities = await asyncio.wrap_future(self.batcher.submit_block(batch))
+            return self.format_predictions(probabilities, invalid)
+        except Exception as e:
+            print(f"Error prediction: {e}")
+            return [{"emotion": "Error", "confidence": 0.0} for _ in boxes]
+
+    def predict_batch(self, batch):
+        """Versi sync predict_batch_async (untuk thread pipeline, bukan event loop)"""
+        if self.batcher is None:
+            return self._predict_batch(batch)
+        return self.batcher.submit_block(batch).result()
+
+    async def predict_batch_async(self, batch):
+        """
+        Probabilitas untuk batch crop (N, 48, 48, 1) yang sudah di-preprocess,
+        sebagai satu unit di micro-batcher (satu forward pass)
+        """
+        if self.batcher is None:
+            return await inference_executor.run_local(self._predict_batch, batch)
+        return await asyncio.wrap_future(self.batcher.submit_block(batch))
+
+    def format_predictions(self, probabilities, invalid):
+        results = [self._format_prediction(row) for row in probabilities]
+        for i in invalid:
+            results[i] = {"emotion": "Error", "confidence": 0.0}
+        return results
+
+    def format_frame_analysis(self, boxes, predictions, ids=None):
+        """
+        Gabungkan box wajah + hasil prediksi ke format response endpoint kamera.
+        `ids` (opsional) = id wajah dari tracker, default urutan box.
+        """
+        faces = []
+        for idx, ((x, y, w, h), prediction) in enumerate(zip(boxes, predictions)):
+            emotion_id = self._emotion_ids.get(prediction["emotion"], -1)
+            faces.append({
+                "id": ids[idx] if ids is not None else idx,
+                "coordinates": {"x": int(x), "y": int(y), "width": int(w), "height": int(h)},
+                "emotion": prediction["emotion"],
+                "emotion_en": self.emotion_labels_en.get(emotion_id, prediction["emotion"]),
+                "emotion_id": emotion_id,
+                "confidence": prediction["confidence"]
+            })
+        return {
+            "success": True,
+            "faces_detected": len(faces),
+            "faces": faces
+        }
+
+    def analyze_frame(self, frame, face_detector=None, preset=None):
+        """
+        Deteksi semua wajah di frame lalu prediksi emosinya dalam satu batch
+        """
+        if face_detector is None:
+            from services.model_registry import get_model
+            face_detector = get_model("face_detector")
+        boxes = face_detector.detect_faces(frame, preset)
+        return self.format_frame_analysis(boxes, self.predict_emotions(frame, boxes))
+
+    def draw_predictions(self, frame, analysis):
+        """Gambar box + label emosi di salinan frame"""
+        from services.vision_pipeline import draw_predictions
+        return draw_predictions(frame, analysis)
+
+    def batch_stats(self):
+        return self.batcher.stats() if self.batcher is not None else {"enabled": False}
+
+    def backend_info(self):
+        return self.backend.info()
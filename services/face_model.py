@@ -1,33 +1,103 @@
+import os
+
 import cv2
 import numpy as np
-from typing import List, Tuple
+from typing import Dict, Literal, Optional, Tuple
+
+# Preset deteksi wajah. Cascade dijalankan di salinan grayscale yang diperkecil
+# sampai sisi terpanjangnya <= max_side, box dipetakan balik ke koordinat asli.
+#   min_size       : ukuran wajah minimum (px gambar asli)
+#   min_face_ratio : ukuran wajah minimum relatif terhadap sisi terpendek gambar
+#   max_levels     : batas jumlah level piramida; scale_factor diperbesar jika lebih
+# "balanced" identik dengan parameter lama untuk gambar <= 960 px (frame webcam),
+# upload besar diperkecil dulu.
+DETECTION_PRESETS: Dict[str, Dict] = {
+    "fast": {"max_side": 480, "scale_factor": 1.15, "min_neighbors": 4, "min_size": 24,
+             "min_face_ratio": 0.06, "max_levels": 12},
+    "balanced": {"max_side": 960, "scale_factor": 1.1, "min_neighbors": 5, "min_size": 30,
+                 "min_face_ratio": 0.03, "max_levels": None},
+    "accurate": {"max_side": None, "scale_factor": 1.05, "min_neighbors": 5, "min_size": 24,
+                 "min_face_ratio": 0.0, "max_levels": None},
+}
+DetectionPresetName = Literal["fast", "balanced", "accurate"]
+
+FACE_DETECTION_PRESET = os.environ.get("FACE_DETECTION_PRESET", "balanced")
+
+
+def detection_params(height: int, width: int, preset: Dict) -> Tuple[float, float, int]:
+    """
+    Parameter detectMultiScale untuk gambar berukuran (height, width):
+    (skala downscale, scale_factor, ukuran wajah minimum di gambar yang diperkecil)
+    """
+    max_side = preset["max_side"]
+    scale = min(1.0, max_side / max(height, width)) if max_side else 1.0
+
+    min_face = max(preset["min_size"], preset["min_face_ratio"] * min(height, width))
+    min_size = max(1, int(round(min_face * scale)))
+
+    # Jumlah level piramida = log(wajah terbesar / wajah terkecil) / log(scale_factor)
+    scale_factor = preset["scale_factor"]
+    max_levels = preset["max_levels"]
+    largest = min(height, width) * scale
+    if max_levels and largest > min_size:
+        scale_factor = max(scale_factor, (largest / min_size) ** (1.0 / max_levels))
+    return scale, scale_factor, min_size
+
 
 class FaceDetectionService:
-    def __init__(self, cascade_path='models/haarcascade_frontalface_default.xml'):
+    def __init__(self, cascade_path='models/haarcascade_frontalface_default.xml', preset: Optional[str] = None):
         """
         Initialize face detection using Haar Cascade
         """
         self.face_cascade = cv2.CascadeClassifier(cascade_path)
-        
+
         # Jika file tidak ditemukan, gunakan default OpenCV
         if self.face_cascade.empty():
             self.face_cascade = cv2.CascadeClassifier(
                 cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
             )
-    
-    def detect_faces(self, image: np.ndarray) -> List[Tuple[int, int, int, int]]:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
+
+        self.preset = preset or FACE_DETECTION_PRESET
+        self._get_preset(self.preset)
+
+    @staticmethod
+    def _get_preset(name: str) -> Dict:
+        if name not in DETECTION_PRESETS:
+            raise ValueError(f"Unknown face detection preset '{name}', choose one of {list(DETECTION_PRESETS)}")
+        return DETECTION_PRESETS[name]
+
+    def detect_faces(self, image: np.ndarray, preset: Optional[str] = None, source_scale: int = 1) -> np.ndarray:
+        """
+        Box wajah (N, 4) int32 (x, y, w, h) dalam koordinat `image`.
+        `image` boleh BGR atau sudah grayscale; `preset` override preset default service.
+        `source_scale` > 1 berarti `image` sudah diperkecil sekian kali dari gambar
+        asli (reduced decode), sehingga ukuran preset tetap dihitung terhadap gambar asli.
+        """
+        params = self._get_preset(preset or self.preset)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        height, width = gray.shape[:2]
+
+        scale, scale_factor, min_size = detection_params(height * source_scale, width * source_scale, params)
+        scale = min(1.0, scale * source_scale)
+        if scale < 1.0:
+            small_size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+            gray = cv2.resize(gray, small_size, interpolation=cv2.INTER_AREA)
+
         # Detect faces
         faces = self.face_cascade.detectMultiScale(
             gray,
-            scaleFactor=1.1,
-            minNeighbors=5,
-            minSize=(30, 30)
+            scaleFactor=scale_factor,
+            minNeighbors=params["min_neighbors"],
+            minSize=(min_size, min_size)
         )
-        
-        return faces
-    
+
+        if len(faces) == 0:
+            return np.empty((0, 4), dtype=np.int32)
+        faces = np.asarray(faces, dtype=np.float64)
+        if scale < 1.0:
+            faces /= scale
+        return np.rint(faces).astype(np.int32)
+
     def extract_face(self, image: np.ndarray, face_coords: Tuple[int, int, int, int]) -> np.ndarray:
         """
         Extract face region from image
@@ -35,5 +105,3 @@ class FaceDetectionService:
         x, y, w, h = face_coords
         face_img = image[y:y+h, x:x+w]
         return face_img
-    
-face_service = FaceDetectionService()
\ No newline at end of file
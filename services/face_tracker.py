@@ -0,0 +1,194 @@
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from utils.cache import LRUCache
+
+# Tracking wajah per sesi kamera: deteksi Haar penuh hanya di keyframe (setiap
+# N frame) atau saat tracking kehilangan wajah, di antaranya box digeser dengan
+# optical flow Lucas-Kanade pada titik fitur di dalam box.
+FACE_TRACK_KEYFRAME_INTERVAL = int(os.environ.get("FACE_TRACK_KEYFRAME_INTERVAL", 5))
+FACE_TRACK_MIN_CONFIDENCE = float(os.environ.get("FACE_TRACK_MIN_CONFIDENCE", 0.5))
+FACE_TRACK_MAX_SESSIONS = int(os.environ.get("FACE_TRACK_MAX_SESSIONS", 256))
+FACE_TRACK_SESSION_TTL = float(os.environ.get("FACE_TRACK_SESSION_TTL", 60))
+
+_LK_PARAMS = dict(winSize=(15, 15), maxLevel=2,
+                  criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+_MAX_POINTS_PER_FACE = 30
+_MIN_POINTS = 4
+_MAX_FB_ERROR = 1.0  # px, error forward-backward maksimum agar titik dianggap ter-track
+_MATCH_IOU = 0.3
+
+
+def _iou(a, b) -> float:
+    ix = max(0.0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+class FaceTracker:
+    """
+    State tracking satu stream. update() dipanggil sekali per frame dan
+    mengembalikan (boxes (N, 4) int32, id wajah, detected) dengan id yang
+    stabil selama wajah masih ter-track atau cocok (IoU) dengan deteksi baru.
+    """
+
+    def __init__(self, detect_fn: Callable, keyframe_interval: int = FACE_TRACK_KEYFRAME_INTERVAL,
+                 min_confidence: float = FACE_TRACK_MIN_CONFIDENCE):
+        self.detect_fn = detect_fn
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.min_confidence = min_confidence
+
+        self._lock = threading.Lock()
+        self._prev_gray: Optional[np.ndarray] = None
+        self._boxes = np.empty((0, 4), dtype=np.float64)
+        self._ids: List[int] = []
+        self._next_id = 0
+        self._since_keyframe = 0
+
+        self.frames = 0
+        self.detections = 0
+
+    def update(self, frame: np.ndarray, preset: Optional[str] = None,
+               source_scale: int = 1) -> Tuple[np.ndarray, List[int], bool]:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+        with self._lock:
+            self.frames += 1
+            boxes = None
+            if (self._prev_gray is not None and self._prev_gray.shape == gray.shape
+                    and self._since_keyframe + 1 < self.keyframe_interval):
+                boxes = self._propagate(self._prev_gray, gray)
+
+            detected = boxes is None
+            if detected:
+                self.detections += 1
+                self._since_keyframe = 0
+                detections = self.detect_fn(gray, preset, source_scale)
+                self._assign_ids(np.asarray(detections, dtype=np.float64).reshape(-1, 4))
+            else:
+                self._since_keyframe += 1
+                self._boxes = boxes
+
+            self._prev_gray = gray
+            return np.rint(self._boxes).astype(np.int32), list(self._ids), detected
+
+    def _propagate(self, prev_gray: np.ndarray, gray: np.ndarray) -> Optional[np.ndarray]:
+        """Box baru hasil optical flow, atau None jika ada wajah yang hilang (perlu deteksi ulang)"""
+        if len(self._boxes) == 0:
+            return None
+
+        height, width = gray.shape
+        points, owners = [], []
+        for i, (x, y, w, h) in enumerate(self._boxes):
+            # Titik fitur di bagian tengah box supaya background tidak ikut ter-track
+            x0, y0 = int(max(x + 0.15 * w, 0)), int(max(y + 0.1 * h, 0))
+            x1, y1 = int(min(x + 0.85 * w, width)), int(min(y + 0.9 * h, height))
+            if x1 - x0 < 8 or y1 - y0 < 8:
+                return None
+            corners = cv2.goodFeaturesToTrack(prev_gray[y0:y1, x0:x1], _MAX_POINTS_PER_FACE, 0.01, 3)
+            if corners is None or len(corners) < _MIN_POINTS:
+                return None
+            corners = corners.reshape(-1, 2) + (x0, y0)
+            points.append(corners)
+            owners.append(np.full(len(corners), i))
+
+        points = np.concatenate(points).astype(np.float32).reshape(-1, 1, 2)
+        owners = np.concatenate(owners)
+
+        # Semua wajah dalam satu panggilan LK, maju lalu mundur untuk validasi
+        forward, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None, **_LK_PARAMS)
+        backward, status_back, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, forward, None, **_LK_PARAMS)
+        fb_error = np.linalg.norm((points - backward).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (status_back.ravel() == 1) & (fb_error < _MAX_FB_ERROR)
+
+        old_points = points.reshape(-1, 2)
+        new_points = forward.reshape(-1, 2)
+        boxes = np.empty_like(self._boxes)
+        for i, (x, y, w, h) in enumerate(self._boxes):
+            mask = owners == i
+            tracked = good & mask
+            if tracked.sum() < _MIN_POINTS or tracked.sum() / mask.sum() < self.min_confidence:
+                return None
+
+            old, new = old_points[tracked], new_points[tracked]
+            # Skala dari perbandingan jarak ke centroid, translasi dari median pergeseran
+            old_spread = np.linalg.norm(old - old.mean(axis=0), axis=1)
+            new_spread = np.linalg.norm(new - new.mean(axis=0), axis=1)
+            valid = old_spread > 1e-3
+            scale = float(np.median(new_spread[valid] / old_spread[valid])) if valid.any() else 1.0
+            dx, dy = np.median(new - old, axis=0)
+
+            cx, cy = x + w / 2 + dx, y + h / 2 + dy
+            w, h = w * scale, h * scale
+            if not (0 <= cx < width and 0 <= cy < height):
+                return None
+            boxes[i] = (cx - w / 2, cy - h / 2, w, h)
+        return boxes
+
+    def _assign_ids(self, detections: np.ndarray):
+        """Id lama dipertahankan untuk deteksi yang overlap dengan box sebelumnya"""
+        ids = []
+        free = list(range(len(self._boxes)))
+        for box in detections:
+            best, best_iou = None, _MATCH_IOU
+            for j in free:
+                score = _iou(box, self._boxes[j])
+                if score >= best_iou:
+                    best, best_iou = j, score
+            if best is None:
+                ids.append(self._next_id)
+                self._next_id += 1
+            else:
+                free.remove(best)
+                ids.append(self._ids[best])
+        self._boxes = detections
+        self._ids = ids
+
+
+class FaceTrackerStore:
+    """Satu FaceTracker per session_id, dibuang otomatis jika sesi idle (LRU + TTL)"""
+
+    def __init__(self, detect_fn: Callable, max_sessions: int = FACE_TRACK_MAX_SESSIONS,
+                 ttl: float = FACE_TRACK_SESSION_TTL):
+        self.detect_fn = detect_fn
+        self._sessions = LRUCache(maxsize=max_sessions, ttl=ttl)
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.detections = 0
+
+    def get(self, session_id: str) -> FaceTracker:
+        tracker = self._sessions.get(session_id)
+        if tracker is None:
+            with self._lock:
+                tracker = self._sessions.get(session_id)
+                if tracker is None:
+                    tracker = FaceTracker(self.detect_fn)
+                self._sessions.put(session_id, tracker)
+        else:
+            # put ulang setiap frame supaya TTL dihitung dari frame terakhir
+            self._sessions.put(session_id, tracker)
+        return tracker
+
+    def track(self, session_id: str, frame: np.ndarray, preset: Optional[str] = None, source_scale: int = 1):
+        boxes, ids, detected = self.get(session_id).update(frame, preset, source_scale)
+        with self._lock:
+            self.frames += 1
+            self.detections += int(detected)
+        return boxes, ids, detected
+
+    def stats(self) -> Dict:
+        with self._lock:
+            frames, detections = self.frames, self.detections
+        return {
+            "sessions": len(self._sessions),
+            "keyframe_interval": FACE_TRACK_KEYFRAME_INTERVAL,
+            "frames": frames,
+            "detections": detections,
+            "detection_ratio": round(detections / frames, 4) if frames else 0.0,
+        }
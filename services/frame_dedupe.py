@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+from utils.cache import LRUCache
+
+# Dedupe frame hampir identik per sesi kamera: frame yang difference hash-nya
+# berbeda <= FRAME_DEDUPE_THRESHOLD bit dari frame terakhir yang dianalisis
+# memakai hasil analisis sebelumnya, maksimal FRAME_DEDUPE_MAX_AGE detik.
+FRAME_DEDUPE_ENABLED = os.environ.get("FRAME_DEDUPE", "1") != "0"
+FRAME_DEDUPE_THRESHOLD = int(os.environ.get("FRAME_DEDUPE_THRESHOLD", 4))
+FRAME_DEDUPE_MAX_AGE = float(os.environ.get("FRAME_DEDUPE_MAX_AGE", 1.0))
+FRAME_DEDUPE_MAX_SESSIONS = int(os.environ.get("FRAME_DEDUPE_MAX_SESSIONS", 256))
+FRAME_DEDUPE_SESSION_TTL = float(os.environ.get("FRAME_DEDUPE_SESSION_TTL", 60))
+
+
+def frame_hash(frame: np.ndarray) -> int:
+    """Difference hash 64-bit: frame diperkecil ke 9x8 grayscale, bit = piksel kiri > kanan"""
+    # Frame besar di-subsample dulu (~256 px) supaya INTER_AREA tidak membaca semua piksel
+    step = max(1, min(frame.shape[:2]) // 256)
+    tiny = cv2.resize(frame[::step, ::step], (9, 8), interpolation=cv2.INTER_AREA)
+    if tiny.ndim == 3:
+        tiny = cv2.cvtColor(tiny, cv2.COLOR_BGR2GRAY)
+    bits = (tiny[:, :-1] > tiny[:, 1:]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+class FrameDedupe:
+    """Hash + hasil analisis frame terakhir per session_id (LRU + TTL idle)"""
+
+    def __init__(self, threshold: int = FRAME_DEDUPE_THRESHOLD, max_age: float = FRAME_DEDUPE_MAX_AGE,
+                 max_sessions: int = FRAME_DEDUPE_MAX_SESSIONS, ttl: float = FRAME_DEDUPE_SESSION_TTL):
+        self.threshold = threshold
+        self.max_age = max_age
+        self._sessions = LRUCache(maxsize=max_sessions, ttl=ttl)
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.skipped = 0
+        self.expired = 0
+
+    def lookup(self, session_id: str, hash_value: int, preset: Optional[str] = None) -> Optional[Dict]:
+        """Analisis cache jika frame ini near-duplicate dari frame terakhir sesi, selain itu None"""
+        entry = self._sessions.get(session_id)
+        with self._lock:
+            self.frames += 1
+            if entry is None or entry["preset"] != preset:
+                return None
+            if (entry["hash"] ^ hash_value).bit_count() > self.threshold:
+                return None
+            if time.monotonic() - entry["analyzed_at"] > self.max_age:
+                # Scene statis tetap dianalisis ulang secara berkala
+                self.expired += 1
+                return None
+            self.skipped += 1
+            return entry["analysis"]
+
+    def store(self, session_id: str, hash_value: int, analysis: Dict, preset: Optional[str] = None):
+        self._sessions.put(session_id, {
+            "hash": hash_value,
+            "preset": preset,
+            "analysis": analysis,
+            "analyzed_at": time.monotonic(),
+        })
+
+    def stats(self) -> Dict:
+        with self._lock:
+            frames, skipped, expired = self.frames, self.skipped, self.expired
+        return {
+            "enabled": FRAME_DEDUPE_ENABLED,
+            "threshold_bits": self.threshold,
+            "max_age_s": self.max_age,
+            "sessions": len(self._sessions),
+            "frames": frames,
+            "skipped": skipped,
+            "analyzed": frames - skipped,
+            "forced_by_age": expired,
+            "skip_rate": round(skipped / frames, 4) if frames else 0.0,
+        }
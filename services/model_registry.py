@@ -0,0 +1,136 @@
+import os
+import resource
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+
+def current_rss_bytes() -> int:
+    """RSS proses saat ini (Linux: /proc/self/statm, fallback: peak RSS)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux melaporkan KB, macOS bytes
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class _Entry:
+    __slots__ = ("lock", "instance", "load_seconds", "rss_delta_bytes", "loaded_at", "hits")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.instance = None
+        self.load_seconds = 0.0
+        self.rss_delta_bytes = 0
+        self.loaded_at = None
+        self.hits = 0
+
+
+class ModelRegistry:
+    """
+    Satu instance per (nama model, path) untuk seluruh proses. Model baru
+    di-load saat pertama diminta, dengan lock per model supaya request
+    paralel tidak me-load model yang sama dua kali dan model lain tidak
+    ikut menunggu. Load time dan kenaikan RSS saat load dicatat per model
+    (RSS bersifat perkiraan jika beberapa model di-load bersamaan).
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Tuple[Callable[[Optional[str]], Any], Optional[str]]] = {}
+        self._entries: Dict[Tuple[str, Optional[str]], _Entry] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[Optional[str]], Any], default_path: Optional[str] = None):
+        self._factories[name] = (factory, default_path)
+
+    def _key(self, name: str, path: Optional[str]) -> Tuple[str, Optional[str]]:
+        if name not in self._factories:
+            raise ValueError(f"Unknown model '{name}', choose one of {sorted(self._factories)}")
+        return name, path or self._factories[name][1]
+
+    def get(self, name: str, path: Optional[str] = None) -> Any:
+        key = self._key(name, path)
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                entry = self._entries.setdefault(key, _Entry())
+
+        if entry.instance is None:
+            with entry.lock:
+                if entry.instance is None:
+                    factory = self._factories[name][0]
+                    rss_before = current_rss_bytes()
+                    start = time.perf_counter()
+                    instance = factory(key[1])
+                    entry.load_seconds = time.perf_counter() - start
+                    entry.rss_delta_bytes = current_rss_bytes() - rss_before
+                    entry.loaded_at = time.time()
+                    entry.instance = instance
+                    print(f"✅ [Registry] {name} loaded in {entry.load_seconds:.2f}s "
+                          f"(+{entry.rss_delta_bytes / 2**20:.1f} MB RSS)")
+
+        entry.hits += 1
+        return entry.instance
+
+    def peek(self, name: str, path: Optional[str] = None) -> Any:
+        """Instance yang sudah di-load, atau None (tidak memicu load)"""
+        entry = self._entries.get(self._key(name, path))
+        return entry.instance if entry is not None else None
+
+    def preload(self, names: Optional[Iterable[str]] = None):
+        for name in names or list(self._factories):
+            self.get(name)
+
+    def stats(self) -> Dict:
+        models = {}
+        for (name, path), entry in list(self._entries.items()):
+            if entry.instance is None:
+                continue
+            models[f"{name}:{path}" if path else name] = {
+                "name": name,
+                "path": path,
+                "load_seconds": round(entry.load_seconds, 3),
+                "rss_delta_mb": round(entry.rss_delta_bytes / 2**20, 1),
+                "loaded_at": entry.loaded_at,
+                "hits": entry.hits,
+            }
+        return {
+            "registered": sorted(self._factories),
+            "loaded": models,
+            "process_rss_mb": round(current_rss_bytes() / 2**20, 1),
+        }
+
+
+# --- Model bawaan aplikasi (import di dalam factory supaya TensorFlow dkk baru di-load saat dipakai) ---
+
+def _load_emotion_cnn(path: Optional[str]):
+    from services.emotion_cnn_model import EmotionCNNModel
+    return EmotionCNNModel(model_path=path)
+
+
+def _load_face_detector(path: Optional[str]):
+    from services.face_model import FaceDetectionService
+    return FaceDetectionService(cascade_path=path)
+
+
+def _load_text_rule(path: Optional[str]):
+    from services.text_model import TextEmotionModel
+    return TextEmotionModel()
+
+
+def _load_text_linear(path: Optional[str]):
+    from services.text_linear_model import LinearTextEmotionModel
+    return LinearTextEmotionModel(model_path=path)
+
+
+registry = ModelRegistry()
+registry.register("emotion_cnn", _load_emotion_cnn, os.environ.get("CNN_MODEL_PATH", "models/model.h5"))
+registry.register("face_detector", _load_face_detector, "models/haarcascade_frontalface_default.xml")
+registry.register("text_rule", _load_text_rule)
+registry.register("text_linear", _load_text_linear, os.environ.get("TEXT_LINEAR_MODEL_PATH", "models/text_linear.joblib"))
+
+
+def get_model(name: str, path: Optional[str] = None) -> Any:
+    return registry.get(name, path)
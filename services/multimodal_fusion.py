@@ -1,5 +1,4 @@
-from services.text_model import TextEmotionModel
-from services.face_model import FaceDetectionService
+from services.model_registry import get_model
 from typing import Dict, Tuple
 
 
@@ -9,8 +8,8 @@ class MultimodalFusion:
     """
     
     def __init__(self, text_weight: float = 0.5, audio_weight: float = 0.5):
-        self.text_model = TextEmotionModel()
-        self.audio_model = FaceDetectionService()
+        self.text_model = get_model("text_rule")
+        self.audio_model = get_model("face_detector")
         self.text_weight = text_weight
         self.audio_weight = audio_weight
         
@@ -0,0 +1,89 @@
+import os
+from typing import Dict, List, Tuple, Union
+
+import joblib
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from utils.text_processing import TextDocument, build_document
+
+
+LINEAR_MODEL_NAME = "hashing_linear_v1"
+
+# Parameter vectorizer disimpan di artifact supaya hashing saat inference
+# selalu sama dengan saat training
+DEFAULT_VECTORIZER_PARAMS = {
+    "analyzer": "char_wb",
+    "ngram_range": (2, 4),
+    "n_features": 2 ** 18,
+    "alternate_sign": False,
+    "norm": "l2",
+    "lowercase": True,
+}
+
+
+class LinearTextEmotionModel:
+    """
+    Model teks alternatif: HashingVectorizer n-gram karakter + classifier
+    linear. Tidak ada typo correction / fuzzy search, biaya inference
+    sebanding dengan panjang teks dan n-gram karakter sudah cukup tahan
+    terhadap variasi ejaan slang. Artifact dibuat oleh train_text_model.py.
+    """
+
+    def __init__(self, model_path: str = 'models/text_linear.joblib'):
+        self.emotion_classes = ["anger", "joy", "sadness", "fear", "disgust", "surprise", "trust", "anticipation", "neutral", "horny"]
+        self.model_name = LINEAR_MODEL_NAME
+        self.model_path = model_path
+        self.classifier = None
+        self.vectorizer = HashingVectorizer(**DEFAULT_VECTORIZER_PARAMS)
+        self.load(model_path)
+
+    @property
+    def is_ready(self) -> bool:
+        return self.classifier is not None
+
+    def load(self, path: str):
+        full_path = os.path.join(os.getcwd(), path)
+        if not os.path.exists(full_path):
+            print(f"❌ [LinearText] File not found: {full_path}")
+            return
+
+        try:
+            artifact = joblib.load(full_path)
+            self.vectorizer = HashingVectorizer(**artifact["vectorizer_params"])
+            self.classifier = artifact["classifier"]
+            self.model_name = artifact.get("model_name", self.model_name)
+            print(f"✅ [LinearText] Model loaded from {full_path}")
+        except Exception as e:
+            print(f"❌ [LinearText] Error loading model: {e}")
+
+    def predict(self, text: Union[str, TextDocument]) -> Tuple[str, float, Dict]:
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts: List[Union[str, TextDocument]]) -> List[Tuple[str, float, Dict]]:
+        """
+        Vectorize semua teks sekaligus lalu satu kali predict_proba untuk seluruh batch
+        """
+        if not self.is_ready:
+            raise RuntimeError("Linear text model is not trained, run train_text_model.py first")
+        if not texts:
+            return []
+
+        docs = [build_document(text) for text in texts]
+        features = self.vectorizer.transform([doc.normalized for doc in docs])
+        probabilities = self.classifier.predict_proba(features)
+        classes = list(self.classifier.classes_)
+        best = probabilities.argmax(axis=1)
+
+        results = []
+        for doc, row, best_index in zip(docs, probabilities, best):
+            emotion = classes[best_index]
+            confidence = float(row[best_index])
+            sentiment_scores = {
+                "emotion": emotion,
+                "confidence": confidence,
+                "model": self.model_name,
+                "probabilities": {label: round(float(p), 4) for label, p in zip(classes, row)},
+                "original_text": doc.original,
+            }
+            results.append((emotion, confidence, sentiment_scores))
+        return results
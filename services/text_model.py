@@ -1,35 +1,232 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple, Dict, List, Optional, Union
+
+from utils import text_processing
+from utils.cache import LRUCache
+from utils.keyword_matcher import tokenize
+from utils.lexicon import Lexicon
 from utils.text_processing import (
+    TextDocument,
+    build_document,
+    clean_text,
+    correct_document,
+    emotion_from_counts,
     keyword_based_emotion, 
-    extract_text_features,
-    validate_and_correct_words,
-    preprocess_text,
-    get_emotion_explanation
+    keyword_based_emotion_batch,
+    get_emotion_explanation,
+    split_into_chunks
 )
-from typing import Tuple, Dict
+
+
+# Teks (setelah dibersihkan) yang lebih panjang dari ini dianalisis per chunk
+LONG_TEXT_THRESHOLD = int(os.environ.get("TEXT_LONG_THRESHOLD", 8000))
+LONG_TEXT_CHUNK_CHARS = int(os.environ.get("TEXT_LONG_CHUNK_CHARS", 2000))
+# 0 = chunk dianalisis berurutan di proses ini (tanpa process pool)
+LONG_TEXT_WORKERS = int(os.environ.get("TEXT_LONG_WORKERS", min(4, os.cpu_count() or 1)))
+# Jangan fork langsung dari server: pool dibuat dari thread request saat thread
+# lain (threadpool, micro-batcher, TensorFlow) mungkin sedang memegang lock, dan
+# lock itu ikut tersalin terkunci di worker -> worker hang selamanya.
+# forkserver mem-fork worker dari proses bersih yang sudah meng-import modul
+# teks; lexicon aktif tetap dikirim lewat initargs.
+LONG_TEXT_START_METHOD = os.environ.get(
+    "TEXT_LONG_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+def _init_chunk_worker(lexicon: Lexicon):
+    # Worker memakai lexicon yang sama persis dengan proses utama saat pool dibuat
+    text_processing.set_lexicon(lexicon)
+
+
+def _analyze_chunk(text: str, lexicon: Optional[Lexicon] = None) -> Dict:
+    """Map step: koreksi typo + hitung keyword untuk satu chunk"""
+    lexicon = lexicon or text_processing.get_lexicon()
+    doc = build_document(text)
+    corrected_text, validation_info = correct_document(doc, lexicon)
+    counts, matches = lexicon.keyword_matcher.match(tokenize(corrected_text.lower()))
+    return {
+        "counts": counts,
+        "matches": matches,
+        "corrected_text": corrected_text,
+        "validation_info": validation_info,
+    }
 
 
 class TextEmotionModel:
-    def __init__(self):
+    def __init__(self, cache_size: Optional[int] = None, cache_ttl: Optional[float] = None):
         self.emotion_classes = ["anger", "joy", "sadness", "fear", "disgust", "surprise", "trust", "anticipation", "neutral", "horny"]
         self.model_name = "rule_based_v3_comprehensive"
+        
+        # Cache hasil prediksi per teks yang sudah dinormalisasi (casing dipertahankan)
+        if cache_size is None:
+            cache_size = int(os.environ.get("TEXT_PREDICTION_CACHE_SIZE", 10000))
+        if cache_ttl is None and os.environ.get("TEXT_CACHE_TTL"):
+            cache_ttl = float(os.environ["TEXT_CACHE_TTL"])
+        self.prediction_cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+        self._cache_generation = text_processing.get_lexicon().generation
+        
+        # Process pool untuk dokumen panjang, dibuat saat pertama dibutuhkan
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_generation = 0
+        self._pool_lock = threading.Lock()
     
-    def predict(self, text: str) -> Tuple[str, float, Dict]:
+    def predict(self, text: Union[str, TextDocument]) -> Tuple[str, float, Dict]:
         """
-        Prediksi emosi dengan validasi dan koreksi typo yang komprehensif
+        Prediksi emosi dengan validasi dan koreksi typo yang komprehensif.
+        Bisa menerima teks mentah atau TextDocument yang sudah dibangun caller.
         """
-        # Step 1: Preprocessing
-        preprocessed_text = preprocess_text(text)
+        # Satu request memakai satu lexicon walaupun ada hot reload di tengah jalan
+        lexicon = text_processing.get_lexicon()
+        
+        # Cache hit cukup membersihkan teks, tanpa tokenisasi/fitur
+        cache_key = self._cache_key(text, lexicon)
+        cached = self.prediction_cache.get(cache_key)
+        if cached is not None:
+            return self._from_cache(cached, text)
+        
+        # Step 1: Normalisasi + tokenisasi (sekali saja untuk semua stage)
+        doc = build_document(text)
         
         # Step 2: Validasi dan koreksi typo
-        corrected_text, validation_info = validate_and_correct_words(preprocessed_text)
+        corrected_text, _ = correct_document(doc, lexicon)
         
-        # Step 3: Extract features
-        features = extract_text_features(corrected_text)
+        # Step 3: Deteksi emosi dengan detailed info
+        keyword_result = keyword_based_emotion(corrected_text, lexicon)
         
-        # Step 4: Deteksi emosi dengan detailed info
-        emotion, base_confidence, emotion_matches = keyword_based_emotion(corrected_text)
+        result = self._compile_result(doc, keyword_result)
+        self._cache_put(cache_key, result)
+        return result
+    
+    def predict_batch(self, texts: List[Union[str, TextDocument]]) -> List[Tuple[str, float, Dict]]:
+        """
+        Prediksi banyak teks sekaligus. Hasil per item sama persis dengan predict(),
+        teks duplikat dalam satu batch hanya dihitung sekali dan scoring keyword
+        dilakukan lewat satu perkalian matrix sparse.
+        """
+        lexicon = text_processing.get_lexicon()
+        results: List[Optional[Tuple[str, float, Dict]]] = [None] * len(texts)
+        pending: Dict[Tuple, List[int]] = {}
         
-        # Step 5: Adjust confidence berdasarkan features
+        for i, text in enumerate(texts):
+            cache_key = self._cache_key(text, lexicon)
+            cached = self.prediction_cache.get(cache_key)
+            if cached is not None:
+                results[i] = self._from_cache(cached, text)
+            else:
+                pending.setdefault(cache_key, []).append(i)
+        
+        if pending:
+            # TextDocument hanya dibangun untuk teks unik yang tidak ada di cache
+            unique_docs = [build_document(texts[indices[0]]) for indices in pending.values()]
+            corrected_texts = [correct_document(doc, lexicon)[0] for doc in unique_docs]
+            keyword_results = keyword_based_emotion_batch(corrected_texts, lexicon)
+            
+            for (cache_key, indices), doc, keyword_result in zip(pending.items(), unique_docs, keyword_results):
+                result = self._compile_result(doc, keyword_result)
+                self._cache_put(cache_key, result)
+                
+                emotion, final_confidence, sentiment_scores = result
+                results[indices[0]] = result
+                for i in indices[1:]:
+                    results[i] = self._from_cache(result, texts[i])
+        
+        return results
+    
+    def predict_long(self, text: Union[str, TextDocument], include_timeline: bool = False) -> Tuple[str, float, Dict]:
+        """
+        Prediksi untuk dokumen panjang (transkrip, dsb) secara map-reduce:
+        teks dipotong di batas kalimat, tiap chunk dikoreksi dan dihitung
+        keyword-nya paralel di process pool, lalu digabung menjadi hasil
+        dengan bentuk yang sama seperti predict(). Teks pendek tanpa timeline
+        tetap lewat predict() biasa.
+        """
+        doc = build_document(text)
+        if len(doc.text) <= LONG_TEXT_THRESHOLD and not include_timeline:
+            return self.predict(doc)
+        
+        lexicon = text_processing.get_lexicon()
+        spans = split_into_chunks(doc.text, LONG_TEXT_CHUNK_CHARS)
+        chunk_texts = [doc.text[start:end] for start, end in spans]
+        
+        if len(chunk_texts) > 1 and LONG_TEXT_WORKERS > 0:
+            chunk_results = list(self._get_pool(lexicon).map(_analyze_chunk, chunk_texts))
+        else:
+            chunk_results = [_analyze_chunk(chunk_text, lexicon) for chunk_text in chunk_texts]
+        
+        # Reduce: jumlah keyword dijumlahkan, detail koreksi digabung berurutan
+        labels = lexicon.keyword_matcher.labels
+        counts = {emotion: 0 for emotion in labels}
+        matches = {emotion: {} for emotion in labels}
+        validation_info = {"total_words": 0, "corrections_made": 0, "correction_details": []}
+        for chunk in chunk_results:
+            for emotion, count in chunk["counts"].items():
+                counts[emotion] += count
+            for emotion, keywords in chunk["matches"].items():
+                matches[emotion].update(dict.fromkeys(keywords))
+            for key in ("total_words", "corrections_made"):
+                validation_info[key] += chunk["validation_info"][key]
+            validation_info["correction_details"].extend(chunk["validation_info"]["correction_details"])
+        
+        doc.corrected_text = " ".join(chunk["corrected_text"] for chunk in chunk_results if chunk["corrected_text"])
+        doc.validation_info = validation_info
+        
+        keyword_result = emotion_from_counts(counts, {emotion: list(keywords) for emotion, keywords in matches.items()})
+        # Fitur sudah dihitung TextDocument atas seluruh teks dalam satu pass
+        emotion, final_confidence, sentiment_scores = self._compile_result(doc, keyword_result)
+        sentiment_scores["chunks"] = len(chunk_results)
+        
+        if include_timeline:
+            timeline = []
+            for index, ((start, end), chunk) in enumerate(zip(spans, chunk_results)):
+                chunk_emotion, chunk_confidence, _ = emotion_from_counts(chunk["counts"], chunk["matches"])
+                timeline.append({
+                    "chunk": index,
+                    "start": start,
+                    "end": end,
+                    "emotion": chunk_emotion,
+                    "confidence": chunk_confidence,
+                    "counts": {label: count for label, count in chunk["counts"].items() if count},
+                })
+            sentiment_scores["timeline"] = timeline
+        
+        return emotion, final_confidence, sentiment_scores
+    
+    def _get_pool(self, lexicon: Lexicon) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            # Lexicon di-reload -> worker lama masih memegang lexicon lama, ganti pool
+            if self._pool is not None and self._pool_generation != lexicon.generation:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+            if self._pool is None:
+                context = multiprocessing.get_context(LONG_TEXT_START_METHOD)
+                if LONG_TEXT_START_METHOD == "forkserver":
+                    # Hanya berpengaruh sebelum forkserver pertama kali jalan
+                    context.set_forkserver_preload(["utils.text_processing"])
+                self._pool = ProcessPoolExecutor(
+                    max_workers=LONG_TEXT_WORKERS,
+                    mp_context=context,
+                    initializer=_init_chunk_worker,
+                    initargs=(lexicon,),
+                )
+                self._pool_generation = lexicon.generation
+            return self._pool
+    
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+    
+    def _compile_result(self, doc: TextDocument, keyword_result: Tuple[str, float, Dict]) -> Tuple[str, float, Dict]:
+        emotion, base_confidence, emotion_matches = keyword_result
+        features = doc.features
+        validation_info = doc.validation_info
+        
+        # Adjust confidence berdasarkan features
         if features['word_count'] < 2:
             base_confidence *= 0.6
         elif features['word_count'] > 20:
@@ -49,12 +246,37 @@ class TextEmotionModel:
             "explanation": get_emotion_explanation(emotion, emotion_matches.get(emotion, [])),
             "validation_info": validation_info,
             "features": features,
-            "original_text": text,
-            "corrected_text": corrected_text,
+            "original_text": doc.original,
+            "corrected_text": doc.corrected_text,
             "corrections_made": validation_info["corrections_made"]
         }
         
         return emotion, final_confidence, sentiment_scores
+    
+    def _cache_key(self, text: Union[str, TextDocument], lexicon: Lexicon) -> Tuple[int, str]:
+        # Lexicon berganti -> semua hasil lama tidak valid lagi
+        if lexicon.generation > self._cache_generation:
+            self.prediction_cache.clear()
+            self._cache_generation = lexicon.generation
+        # Casing ikut jadi key karena mempengaruhi fitur caps lock
+        return lexicon.generation, text.text if isinstance(text, TextDocument) else clean_text(text)
+    
+    @staticmethod
+    def _from_cache(cached: Tuple[str, float, Dict], text: Union[str, TextDocument]) -> Tuple[str, float, Dict]:
+        emotion, final_confidence, sentiment_scores = cached
+        original = text.original if isinstance(text, TextDocument) else text
+        return emotion, final_confidence, dict(sentiment_scores, original_text=original)
+    
+    def _cache_put(self, cache_key: Tuple[int, str], result: Tuple[str, float, Dict]):
+        emotion, final_confidence, sentiment_scores = result
+        self.prediction_cache.put(cache_key, (emotion, final_confidence, dict(sentiment_scores)))
+    
+    def cache_stats(self) -> Dict:
+        return {
+            "lexicon": text_processing.get_lexicon().info(),
+            "token_cache": text_processing.TOKEN_CACHE.stats(),
+            "prediction_cache": self.prediction_cache.stats(),
+        }
 
 
 # Test
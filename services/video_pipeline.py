@@ -0,0 +1,238 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterator, Optional
+
+import cv2
+import numpy as np
+
+from services.model_registry import current_rss_bytes, get_model
+from services.vision_pipeline import detect_faces
+
+# Analisis file video: tiga stage yang berjalan bersamaan di thread masing-masing,
+# dihubungkan antrian berukuran tetap (decode -> deteksi+crop -> inference batch),
+# sehingga memori maksimal ~VIDEO_QUEUE_SIZE frame per antrian berapa pun panjang videonya.
+VIDEO_SAMPLE_FPS = float(os.environ.get("VIDEO_SAMPLE_FPS", 2))
+VIDEO_MAX_FRAMES = int(os.environ.get("VIDEO_MAX_FRAMES", 3000))
+VIDEO_QUEUE_SIZE = int(os.environ.get("VIDEO_QUEUE_SIZE", 8))
+VIDEO_BATCH_FRAMES = int(os.environ.get("VIDEO_BATCH_FRAMES", 8))
+
+_END = object()
+
+
+def probe_video(path: str) -> Optional[Dict]:
+    """fps, jumlah frame dan ukuran video; None jika tidak bisa dibuka"""
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            return None
+        return {
+            "fps": capture.get(cv2.CAP_PROP_FPS) or 0.0,
+            "frame_count": int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0),
+            "width": int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        }
+    finally:
+        capture.release()
+
+
+class _Stage(threading.Thread):
+    """Thread satu stage; error disimpan dan diteruskan sebagai akhir stream"""
+
+    def __init__(self, name: str, target, stop: threading.Event, output: queue.Queue):
+        super().__init__(name=name, daemon=True)
+        self._target_fn = target
+        self.stop = stop
+        self.output = output
+        self.error: Optional[BaseException] = None
+        self.busy_seconds = 0.0
+
+    def put(self, item) -> bool:
+        # Antrian penuh = stage berikutnya tertinggal; tunggu (backpressure) kecuali dihentikan
+        while not self.stop.is_set():
+            try:
+                self.output.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(self):
+        try:
+            self._target_fn(self)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.put(_END)
+
+
+def _get(source: queue.Queue, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            return source.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _END
+
+
+def analyze_video(path: str, sample_fps: float = VIDEO_SAMPLE_FPS, preset: Optional[str] = None,
+                  max_frames: int = VIDEO_MAX_FRAMES, queue_size: int = VIDEO_QUEUE_SIZE,
+                  batch_frames: int = VIDEO_BATCH_FRAMES) -> Iterator[Dict]:
+    """
+    Generator hasil analisis video: satu dict {"type": "frame", ...} per frame
+    sampel (urut timestamp), diakhiri {"type": "summary", ...} berisi distribusi
+    emosi, throughput dan pemakaian memori. Menutup generator (client putus)
+    menghentikan semua stage.
+    """
+    emotion_model = get_model("emotion_cnn")
+    info = probe_video(path) or {"fps": 0.0, "frame_count": 0, "width": 0, "height": 0}
+    video_fps = info["fps"]
+
+    stop = threading.Event()
+    decoded: queue.Queue = queue.Queue(maxsize=queue_size)
+    prepared: queue.Queue = queue.Queue(maxsize=queue_size)
+    results: queue.Queue = queue.Queue(maxsize=queue_size)
+    counters = {"frames_read": 0}
+
+    def decode(stage: _Stage):
+        capture = cv2.VideoCapture(path)
+        interval = 1.0 / sample_fps if sample_fps > 0 else 0.0
+        next_timestamp = 0.0
+        index = -1
+        sampled = 0
+        try:
+            while sampled < max_frames and not stop.is_set():
+                # grab() tanpa decode penuh untuk frame yang tidak disampel
+                started = time.perf_counter()
+                if not capture.grab():
+                    break
+                index += 1
+                timestamp = index / video_fps if video_fps else capture.get(cv2.CAP_PROP_POS_MSEC) / 1000
+                if timestamp + 1e-6 < next_timestamp:
+                    stage.busy_seconds += time.perf_counter() - started
+                    continue
+                next_timestamp += interval
+                ok, frame = capture.retrieve()
+                if ok:
+                    # Deteksi dan crop CNN hanya butuh grayscale: antrian memegang 1 channel, bukan 3
+                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                stage.busy_seconds += time.perf_counter() - started
+                if not ok:
+                    continue
+                sampled += 1
+                if not stage.put((index, timestamp, frame)):
+                    break
+        finally:
+            counters["frames_read"] = index + 1
+            capture.release()
+
+    def detect(stage: _Stage):
+        while True:
+            item = _get(decoded, stop)
+            if item is _END:
+                return
+            index, timestamp, frame = item
+            started = time.perf_counter()
+            boxes = detect_faces(frame, preset)
+            crops, invalid = emotion_model.preprocess_faces(frame, boxes)
+            stage.busy_seconds += time.perf_counter() - started
+            # Frame penuh dilepas di sini, stage berikutnya hanya memegang crop 48x48
+            if not stage.put((index, timestamp, boxes, crops, invalid)):
+                return
+
+    def infer(stage: _Stage):
+        finished = False
+        while not finished:
+            # Kumpulkan beberapa frame lalu klasifikasi semua wajahnya dalam satu forward pass
+            group = [_get(prepared, stop)]
+            if group[0] is _END:
+                return
+            while len(group) < batch_frames:
+                try:
+                    item = prepared.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _END:
+                    finished = True
+                    break
+                group.append(item)
+
+            started = time.perf_counter()
+            crops = [item[3] for item in group if len(item[3])]
+            probabilities = emotion_model.predict_batch(np.concatenate(crops)) if crops else None
+            stage.busy_seconds += time.perf_counter() - started
+
+            offset = 0
+            for index, timestamp, boxes, _, invalid in group:
+                count = len(boxes)
+                predictions = (emotion_model.format_predictions(probabilities[offset:offset + count], invalid)
+                               if count else [])
+                offset += count
+                if not stage.put((index, timestamp, emotion_model.format_frame_analysis(boxes, predictions))):
+                    return
+
+    stages = [
+        _Stage("video-decode", decode, stop, decoded),
+        _Stage("video-detect", detect, stop, prepared),
+        _Stage("video-infer", infer, stop, results),
+    ]
+    rss_start = rss_peak = current_rss_bytes()
+    started = time.perf_counter()
+    distribution: Counter = Counter()
+    frames_analyzed = 0
+    faces_total = 0
+    for stage in stages:
+        stage.start()
+
+    try:
+        while True:
+            item = _get(results, stop)
+            if item is _END:
+                break
+            index, timestamp, analysis = item
+            frames_analyzed += 1
+            faces_total += analysis["faces_detected"]
+            emotions = Counter(face["emotion"] for face in analysis["faces"])
+            distribution.update(emotions)
+            rss_peak = max(rss_peak, current_rss_bytes())
+            yield {
+                "type": "frame",
+                "frame_index": index,
+                "timestamp": round(timestamp, 3),
+                "dominant_emotion": emotions.most_common(1)[0][0] if emotions else None,
+                **analysis,
+            }
+
+        errors = [f"{stage.name}: {stage.error}" for stage in stages if stage.error is not None]
+        elapsed = time.perf_counter() - started
+        total_faces = sum(distribution.values())
+        yield {
+            "type": "summary",
+            "success": not errors,
+            "errors": errors,
+            "video": info,
+            "sample_fps": sample_fps,
+            "frames_read": counters["frames_read"],
+            "frames_analyzed": frames_analyzed,
+            "faces_detected": faces_total,
+            "emotion_distribution": dict(distribution),
+            "emotion_percentages": {
+                emotion: round(count / total_faces, 4) for emotion, count in distribution.items()
+            } if total_faces else {},
+            "elapsed_s": round(elapsed, 3),
+            "throughput_fps": round(frames_analyzed / elapsed, 2) if elapsed > 0 else 0.0,
+            "stage_busy_s": {stage.name: round(stage.busy_seconds, 3) for stage in stages},
+            "memory": {
+                "queue_size": queue_size,
+                # Paling banyak queue_size frame gray menunggu deteksi (+1 di tiap stage)
+                "max_buffered_frame_mb": round((queue_size + 2) * info["width"] * info["height"] / 2**20, 1),
+                "rss_start_mb": round(rss_start / 2**20, 1),
+                "rss_peak_mb": round(rss_peak / 2**20, 1),
+            },
+        }
+    finally:
+        stop.set()
+        for stage in stages:
+            stage.join(timeout=5)
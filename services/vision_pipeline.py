@@ -0,0 +1,378 @@
+import asyncio
+import base64
+import binascii
+import io
+import os
+from typing import List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from services.face_model import DETECTION_PRESETS, FACE_DETECTION_PRESET
+from services.face_tracker import FaceTrackerStore
+from services.frame_dedupe import FRAME_DEDUPE_ENABLED, FrameDedupe, frame_hash
+from services.model_registry import get_model
+from utils.face_preprocessing import preprocess_face_batch
+from utils.inference_executor import InferenceExecutor
+
+
+# Executor untuk kerja OpenCV yang blocking (decode, deteksi wajah, encode).
+# Inference CNN sendiri berjalan di thread micro-batcher EmotionCNNModel.
+VISION_EXECUTOR_KIND = os.environ.get("VISION_EXECUTOR", "thread")
+VISION_EXECUTOR_WORKERS = int(os.environ.get("VISION_EXECUTOR_WORKERS", 0)) or None
+
+inference_executor = InferenceExecutor(
+    max_workers=VISION_EXECUTOR_WORKERS,
+    kind=VISION_EXECUTOR_KIND,
+    name="vision",
+    start_method=os.environ.get("VISION_EXECUTOR_START_METHOD")
+)
+
+# Gambar anotasi: kualitas JPEG default (95 = default OpenCV) dan ukuran thumbnail
+ANNOTATION_JPEG_QUALITY = int(os.environ.get("ANNOTATION_JPEG_QUALITY", 95))
+THUMBNAIL_MAX_SIDE = int(os.environ.get("THUMBNAIL_MAX_SIDE", 320))
+THUMBNAIL_JPEG_QUALITY = int(os.environ.get("THUMBNAIL_JPEG_QUALITY", 75))
+
+# Decode frame langsung ke grayscale (cascade dan CNN hanya butuh gray). Gambar
+# yang jauh lebih besar dari ukuran kerja preset deteksi di-decode dengan
+# IMREAD_REDUCED_GRAYSCALE_2/4/8 (JPEG: downscale di domain DCT, jauh lebih
+# murah dari decode penuh + resize). Sisi terpanjang hasil decode tidak pernah
+# di bawah REDUCED_DECODE_MIN_SIDE supaya crop wajah untuk CNN tetap cukup besar.
+REDUCED_DECODE_ENABLED = os.environ.get("REDUCED_DECODE", "1") != "0"
+REDUCED_DECODE_MIN_SIDE = int(os.environ.get("REDUCED_DECODE_MIN_SIDE", 640))
+
+_REDUCED_GRAYSCALE = {1: cv2.IMREAD_GRAYSCALE, 2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+                      4: cv2.IMREAD_REDUCED_GRAYSCALE_4, 8: cv2.IMREAD_REDUCED_GRAYSCALE_8}
+_REDUCED_COLOR = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+                  4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+# --- Task level modul (bisa di-pickle untuk executor mode process) ---
+
+def decode_image(data: bytes):
+    """Bytes JPEG/PNG -> gambar BGR, None jika tidak valid"""
+    if not data:
+        return None
+    nparr = np.frombuffer(data, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+def decode_base64_bytes(frame: str) -> Optional[bytes]:
+    """String base64 (boleh dengan prefix data URL) -> bytes, None jika bukan base64 valid"""
+    if frame.startswith("data:image"):
+        frame = frame[frame.find(",") + 1:]
+    try:
+        return binascii.a2b_base64(frame)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def decode_base64_image(frame: str):
+    """String base64 (boleh dengan prefix data URL) -> gambar BGR, None jika tidak valid"""
+    image_bytes = decode_base64_bytes(frame)
+    return decode_image(image_bytes) if image_bytes is not None else None
+
+
+class PreparedImage(NamedTuple):
+    """
+    Frame siap analisis: `gray` dipakai bersama oleh deteksi wajah dan crop CNN,
+    `scale` = faktor reduced decode (koordinat asli = koordinat gray * scale),
+    `data` = bytes asli untuk decode warna jika gambar anotasi diminta.
+    """
+    gray: np.ndarray
+    scale: int
+    data: bytes
+
+
+def image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """(width, height) dari header gambar tanpa decode piksel, None jika tidak dikenali"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.size
+    except Exception:
+        return None
+
+
+def reduction_factor(width: int, height: int, target_side: Optional[int]) -> int:
+    """Faktor 1/2/4/8 terbesar yang sisi terpanjang hasilnya masih >= target_side"""
+    if not target_side:
+        return 1
+    longest = max(width, height)
+    for factor in (8, 4, 2):
+        if longest // factor >= target_side:
+            return factor
+    return 1
+
+
+def decode_target_side(preset: Optional[str] = None) -> Optional[int]:
+    """Ukuran kerja deteksi untuk preset (None = resolusi penuh)"""
+    if not REDUCED_DECODE_ENABLED:
+        return None
+    max_side = DETECTION_PRESETS.get(preset or FACE_DETECTION_PRESET, {}).get("max_side")
+    return max(max_side, REDUCED_DECODE_MIN_SIDE) if max_side else None
+
+
+def prepare_image(data: bytes, preset: Optional[str] = None) -> Optional[PreparedImage]:
+    """Bytes JPEG/PNG -> PreparedImage (grayscale, reduced jika besar), None jika tidak valid"""
+    if not data:
+        return None
+    size = image_size(data)
+    factor = reduction_factor(*size, decode_target_side(preset)) if size else 1
+    gray = cv2.imdecode(np.frombuffer(data, np.uint8), _REDUCED_GRAYSCALE[factor])
+    if gray is None:
+        return None
+    return PreparedImage(gray, factor, data)
+
+
+def prepare_base64_image(frame: str, preset: Optional[str] = None) -> Optional[PreparedImage]:
+    image_bytes = decode_base64_bytes(frame)
+    return prepare_image(image_bytes, preset) if image_bytes is not None else None
+
+
+def decode_color(prepared: PreparedImage, max_side: Optional[int] = None):
+    """
+    Decode warna frame (hanya untuk gambar anotasi). Dengan max_side (thumbnail)
+    dipakai reduced decode terbesar yang masih >= max_side.
+    Return (gambar BGR, faktor reduksinya).
+    """
+    height, width = prepared.gray.shape[:2]
+    factor = reduction_factor(width * prepared.scale, height * prepared.scale, max_side)
+    image = cv2.imdecode(np.frombuffer(prepared.data, np.uint8), _REDUCED_COLOR[factor])
+    return image, factor
+
+
+def detect_faces(image, preset=None, source_scale=1):
+    return get_model("face_detector").detect_faces(image, preset, source_scale)
+
+
+# Tracker wajah per sesi kamera (state di proses ini, lihat analyze_frame)
+face_trackers = FaceTrackerStore(detect_faces)
+
+
+# Hasil analisis terakhir per sesi untuk frame near-duplicate
+frame_dedupe = FrameDedupe()
+
+
+def track_faces(session_id, frame, preset=None, source_scale=1):
+    return face_trackers.track(session_id, frame, preset, source_scale)
+
+
+def encode_jpeg(image, quality: int = ANNOTATION_JPEG_QUALITY) -> bytes:
+    _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    return buffer.tobytes()
+
+
+def encode_jpeg_base64(image, quality: int = ANNOTATION_JPEG_QUALITY) -> str:
+    return base64.b64encode(encode_jpeg(image, quality)).decode('utf-8')
+
+
+def render_annotated_jpeg(image, boxes, labels, max_side=None, quality: int = ANNOTATION_JPEG_QUALITY,
+                          in_place: bool = False) -> bytes:
+    """
+    Gambar box + label lalu encode ke JPEG. Dengan max_side gambar diperkecil
+    dulu (box ikut diskalakan), jadi yang digambar dan di-encode hanya
+    thumbnail. Tanpa in_place, gambar ukuran penuh digambar di salinannya.
+    """
+    height, width = image.shape[:2]
+    scale = min(1.0, max_side / max(height, width)) if max_side else 1.0
+    if scale < 1.0:
+        size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+        canvas = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    else:
+        canvas = image if in_place else image.copy()
+
+    thickness = 2 if scale >= 0.5 else 1
+    font_scale = 0.9 * max(scale, 0.45)
+    for (x, y, w, h), label in zip(boxes, labels):
+        x0, y0 = int(round(x * scale)), int(round(y * scale))
+        x1, y1 = int(round((x + w) * scale)), int(round((y + h) * scale))
+        cv2.rectangle(canvas, (x0, y0), (x1, y1), (0, 255, 0), thickness)
+        cv2.putText(canvas, label, (x0, y0 - int(10 * max(scale, 0.45))), cv2.FONT_HERSHEY_SIMPLEX,
+                    font_scale, (0, 255, 0), thickness)
+    return encode_jpeg(canvas, quality)
+
+
+def render_prepared_jpeg(prepared: PreparedImage, boxes, labels, max_side=None,
+                         quality: int = ANNOTATION_JPEG_QUALITY) -> bytes:
+    """render_annotated_jpeg untuk PreparedImage: warna baru di-decode di sini (box dalam koordinat asli)"""
+    image, factor = decode_color(prepared, max_side)
+    if image is None:
+        # Mis. format yang hanya bisa di-decode grayscale: anotasi di atas gray
+        image, factor = cv2.cvtColor(prepared.gray, cv2.COLOR_GRAY2BGR), prepared.scale
+    if factor > 1:
+        boxes = [(x / factor, y / factor, w / factor, h / factor) for x, y, w, h in boxes]
+    return render_annotated_jpeg(image, boxes, labels, max_side, quality, in_place=True)
+
+
+def annotate_and_encode(image, boxes, labels) -> str:
+    """Gambar box + label di gambar (in-place) lalu encode ke JPEG base64"""
+    return base64.b64encode(render_annotated_jpeg(image, boxes, labels, in_place=True)).decode('utf-8')
+
+
+def analysis_boxes_and_labels(analysis):
+    """Box (x, y, w, h) + label "<emosi> <confidence>" dari hasil analyze_frame"""
+    boxes, labels = [], []
+    for face in analysis["faces"]:
+        box = face["coordinates"]
+        boxes.append((box["x"], box["y"], box["width"], box["height"]))
+        labels.append(f"{face['emotion_en']} {face['confidence']:.0%}")
+    return boxes, labels
+
+
+def draw_predictions(frame, analysis):
+    """Gambar box + label emosi (hasil analyze_frame) di salinan frame"""
+    annotated = frame.copy()
+    for (x, y, w, h), label in zip(*analysis_boxes_and_labels(analysis)):
+        cv2.rectangle(annotated, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        cv2.putText(annotated, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+    return annotated
+
+
+def draw_and_encode(frame, analysis) -> str:
+    return encode_jpeg_base64(draw_predictions(frame, analysis))
+
+
+class PreparedFrame(NamedTuple):
+    """Hasil stage 1 batch: box wajah + crop siap CNN (frame penuh sudah dilepas)"""
+    boxes: np.ndarray
+    ids: Optional[List[int]]
+    batch: np.ndarray
+    invalid: List[int]
+    detected: Optional[bool]
+
+
+def _frame_and_scale(frame):
+    """PreparedImage -> (gray, scale); gambar biasa (BGR/gray) -> (gambar, 1)"""
+    if isinstance(frame, PreparedImage):
+        return frame.gray, frame.scale
+    return frame, 1
+
+
+def _to_source(boxes, scale):
+    """Box di gambar reduced -> koordinat gambar asli"""
+    return np.asarray(boxes) * scale if scale > 1 else boxes
+
+
+def prepare_frame(frame_data, preset=None, session_id=None) -> PreparedFrame:
+    """Decode grayscale (base64 str atau bytes), deteksi/tracking wajah dan crop semua wajah satu frame"""
+    if isinstance(frame_data, str):
+        prepared = prepare_base64_image(frame_data, preset)
+    else:
+        prepared = prepare_image(frame_data, preset)
+    if prepared is None:
+        raise ValueError("Invalid frame data")
+    gray, scale = prepared.gray, prepared.scale
+    if session_id is None:
+        boxes, ids, detected = detect_faces(gray, preset, scale), None, None
+    else:
+        boxes, ids, detected = track_faces(session_id, gray, preset, scale)
+    # Crop diambil (view) dari buffer gray yang sama dengan deteksi
+    batch, invalid = preprocess_face_batch(gray, boxes)
+    return PreparedFrame(_to_source(boxes, scale), ids, batch, invalid, detected)
+
+
+def prepare_session_frames(session_id, frames) -> List:
+    """Frame satu sesi diproses berurutan (state tracker); error per frame dikembalikan, bukan di-raise"""
+    results = []
+    for frame_data, preset in frames:
+        try:
+            results.append(prepare_frame(frame_data, preset, session_id))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+async def analyze_frame(emotion_model, frame, preset=None, session_id=None):
+    """
+    Versi async dari EmotionCNNModel.analyze_frame: deteksi wajah di executor,
+    klasifikasi lewat micro-batcher, event loop tidak pernah ditahan.
+    `frame` boleh PreparedImage (deteksi dan crop dari buffer gray yang sama,
+    box dikembalikan dalam koordinat gambar asli) atau gambar BGR/gray.
+
+    Dengan session_id, frame yang hampir identik dengan frame terakhir sesi
+    langsung memakai hasil sebelumnya ("cached": true); selain itu box wajah
+    diambil dari tracker sesi (deteksi penuh hanya di keyframe) dan id wajah
+    stabil antar frame.
+    """
+    image, scale = _frame_and_scale(frame)
+    if session_id is None:
+        boxes = await inference_executor.run(detect_faces, image, preset, scale)
+        predictions = await emotion_model.predict_emotions_async(image, boxes)
+        return emotion_model.format_frame_analysis(_to_source(boxes, scale), predictions)
+
+    if FRAME_DEDUPE_ENABLED:
+        hash_value = await inference_executor.run(frame_hash, image)
+        cached = frame_dedupe.lookup(session_id, hash_value, preset)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+    # State tracker harus tetap di proses ini, jangan dikirim ke process pool
+    boxes, ids, detected = await inference_executor.run_local(track_faces, session_id, image, preset, scale)
+    predictions = await emotion_model.predict_emotions_async(image, boxes)
+    analysis = emotion_model.format_frame_analysis(_to_source(boxes, scale), predictions, ids)
+    analysis["tracking"] = {"session_id": session_id, "detected": detected}
+    analysis["cached"] = False
+    if FRAME_DEDUPE_ENABLED:
+        frame_dedupe.store(session_id, hash_value, analysis, preset)
+    return analysis
+
+
+async def analyze_frames(emotion_model, frames: List[Tuple]) -> List[dict]:
+    """
+    Analisis banyak frame (data, preset, session_id) sekaligus:
+      1. decode + deteksi + crop paralel di inference executor (frame dengan
+         session_id yang sama berurutan lewat tracker sesi),
+      2. semua wajah dari semua frame diklasifikasi dalam satu forward pass,
+      3. hasil disusun ulang sesuai urutan input; frame yang gagal menjadi
+         entry {"frame_index", "success": False, "error"}.
+    """
+    prepared: List = [None] * len(frames)
+
+    async def prepare_single(index):
+        data, preset, _ = frames[index]
+        try:
+            prepared[index] = await inference_executor.run(prepare_frame, data, preset)
+        except Exception as e:
+            prepared[index] = e
+
+    async def prepare_session(session_id, indices):
+        # Frame bersesi -> state tracker, tetap di proses ini
+        results = await inference_executor.run_local(prepare_session_frames, session_id, [frames[i][:2] for i in indices])
+        for index, result in zip(indices, results):
+            prepared[index] = result
+
+    sessions = {}
+    tasks = []
+    for index, (_, _, session_id) in enumerate(frames):
+        if session_id is None:
+            tasks.append(prepare_single(index))
+        else:
+            sessions.setdefault(session_id, []).append(index)
+    tasks.extend(prepare_session(session_id, indices) for session_id, indices in sessions.items())
+    await asyncio.gather(*tasks)
+
+    crops = [p.batch for p in prepared if isinstance(p, PreparedFrame) and len(p.batch)]
+    probabilities = None
+    if crops:
+        try:
+            probabilities = await emotion_model.predict_batch_async(np.concatenate(crops))
+        except Exception as e:
+            print(f"Error prediction: {e}")
+            prepared = [e if isinstance(p, PreparedFrame) and len(p.batch) else p for p in prepared]
+
+    results = []
+    offset = 0
+    for index, p in enumerate(prepared):
+        if isinstance(p, Exception):
+            results.append({"frame_index": index, "success": False, "error": str(p)})
+            continue
+        count = len(p.boxes)
+        predictions = emotion_model.format_predictions(probabilities[offset:offset + count], p.invalid) if count else []
+        offset += count
+        analysis = emotion_model.format_frame_analysis(p.boxes, predictions, p.ids)
+        if p.detected is not None:
+            analysis["tracking"] = {"session_id": frames[index][2], "detected": p.detected}
+        analysis["frame_index"] = index
+        results.append(analysis)
+    return results
@@ -0,0 +1,159 @@
+"""
+Training classifier teks linear (HashingVectorizer + SGD) untuk LinearTextEmotionModel.
+
+Label di-bootstrap dari rule engine (TextEmotionModel) atas kalimat sintetis
+yang dibentuk dari vocabulary + variasi ejaan slang, ditambah teks tanpa label
+(opsional, dilabeli rule engine) dan CSV berlabel (opsional, kolom text,label).
+
+    python train_text_model.py
+    python train_text_model.py --labeled data/labeled.csv --unlabeled data/chat.csv
+"""
+import argparse
+import csv
+import os
+import random
+import time
+
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+
+from services.text_linear_model import DEFAULT_VECTORIZER_PARAMS, LINEAR_MODEL_NAME
+from services.text_model import TextEmotionModel
+from utils.text_processing import get_lexicon
+
+
+TEMPLATES = [
+    "{kw}",
+    "{kw} banget",
+    "aku {kw}",
+    "gua lagi {kw}",
+    "hari ini {kw} sekali",
+    "jujur gue {kw} parah",
+    "kok {kw} sih",
+    "i feel {kw}",
+    "so {kw} right now",
+    "{kw} wkwk",
+    "sumpah {kw} bgt",
+]
+
+NEUTRAL_TEXTS = [
+    "aku lagi di rumah", "besok ada rapat jam sembilan", "lagi makan siang",
+    "kirim filenya ya", "nanti aku kabari", "udah sampai mana", "ok noted",
+    "jadwal kuliah hari ini", "lagi otw kantor", "the meeting is at noon",
+    "please send the report", "where are you now", "check the link below",
+    "nomor pesanan saya berapa", "tolong cek email", "lagi nunggu bus",
+]
+
+
+def slang_variant(text: str, rng: random.Random) -> str:
+    """Variasi ejaan slang: huruf vokal hilang, huruf akhir diulang, typo kecil"""
+    words = []
+    for word in text.split():
+        roll = rng.random()
+        if roll < 0.2 and len(word) > 3:
+            word = word[0] + "".join(c for c in word[1:] if c not in "aiueo")
+        elif roll < 0.35:
+            word = word + word[-1] * rng.randint(1, 3)
+        elif roll < 0.5 and len(word) > 3:
+            i = rng.randrange(1, len(word) - 1)
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+        words.append(word)
+    return " ".join(words)
+
+
+def read_texts(path: str, column: str = "text"):
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            text = (row.get(column) or "").strip()
+            if text:
+                yield row, text
+
+
+def build_dataset(rule_model: TextEmotionModel, args, rng: random.Random):
+    clean_texts = []
+    for keywords in get_lexicon().vocabulary.values():
+        for kw in keywords:
+            for template in rng.sample(TEMPLATES, k=min(args.templates_per_keyword, len(TEMPLATES))):
+                clean_texts.append(template.format(kw=kw))
+    clean_texts.extend(NEUTRAL_TEXTS)
+
+    if args.unlabeled:
+        clean_texts.extend(text for _, text in read_texts(args.unlabeled, args.text_column))
+
+    # Label dari rule engine atas teks bersih, lalu variasi slang memakai label yang sama
+    texts, labels, weights = [], [], []
+    for text, (emotion, _, _) in zip(clean_texts, rule_model.predict_batch(clean_texts)):
+        texts.append(text)
+        labels.append(emotion)
+        weights.append(1.0)
+        for _ in range(args.variants):
+            texts.append(slang_variant(text, rng))
+            labels.append(emotion)
+            weights.append(1.0)
+
+    if args.labeled:
+        valid_labels = set(rule_model.emotion_classes)
+        for row, text in read_texts(args.labeled, args.text_column):
+            label = (row.get(args.label_column) or "").strip()
+            if label not in valid_labels:
+                continue
+            texts.append(text)
+            labels.append(label)
+            weights.append(args.labeled_weight)
+
+    return texts, labels, np.array(weights)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train hashing-vectorizer linear text emotion classifier")
+    parser.add_argument("--labeled", help="CSV berlabel (kolom text dan label)")
+    parser.add_argument("--unlabeled", help="CSV tanpa label, dilabeli oleh rule engine")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--label-column", default="label")
+    parser.add_argument("--labeled-weight", type=float, default=3.0)
+    parser.add_argument("--templates-per-keyword", type=int, default=6)
+    parser.add_argument("--variants", type=int, default=2, help="Jumlah variasi slang per kalimat")
+    parser.add_argument("--holdout", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="models/text_linear.joblib")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rule_model = TextEmotionModel(cache_size=0)
+
+    print("Building dataset...")
+    texts, labels, weights = build_dataset(rule_model, args, rng)
+    labels = np.array(labels)
+
+    order = np.random.RandomState(args.seed).permutation(len(texts))
+    split = int(len(order) * (1 - args.holdout))
+    train_idx, test_idx = order[:split], order[split:]
+
+    vectorizer = HashingVectorizer(**DEFAULT_VECTORIZER_PARAMS)
+    features = vectorizer.transform(texts)
+
+    print(f"Training on {len(train_idx)} samples...")
+    start = time.time()
+    classifier = SGDClassifier(loss="log_loss", alpha=1e-5, max_iter=100, tol=1e-4, random_state=args.seed)
+    classifier.fit(features[train_idx], labels[train_idx], sample_weight=weights[train_idx])
+    print(f"Done in {time.time() - start:.1f}s")
+
+    if len(test_idx):
+        accuracy = float((classifier.predict(features[test_idx]) == labels[test_idx]).mean())
+        print(f"Holdout accuracy: {accuracy:.2%} ({len(test_idx)} samples)")
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    joblib.dump({
+        "model_name": LINEAR_MODEL_NAME,
+        "vectorizer_params": DEFAULT_VECTORIZER_PARAMS,
+        "classifier": classifier,
+        "trained_at": time.time(),
+        "n_samples": len(train_idx),
+    }, args.out)
+    print(f"✅ Saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
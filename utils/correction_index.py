@@ -0,0 +1,67 @@
+from difflib import SequenceMatcher
+from typing import Iterable, Optional
+
+import numpy as np
+
+
+class CorrectionIndex:
+    """
+    Index fuzzy-correction yang dibangun sekali dari semua keyword.
+
+    Hasilnya identik dengan difflib.get_close_matches(word, keywords, n=1,
+    cutoff=cutoff), tapi batas real_quick_ratio (panjang kata) dan
+    quick_ratio (irisan jumlah karakter) dihitung sekaligus untuk semua
+    keyword lewat matrix karakter yang sudah disiapkan di depan, sehingga
+    SequenceMatcher.ratio() hanya dijalankan untuk sedikit kandidat yang
+    memang mungkin lolos cutoff.
+    """
+
+    def __init__(self, keywords: Iterable[str], cutoff: float):
+        self.cutoff = cutoff
+        self.keywords = frozenset(keywords)
+
+        self._words = sorted(self.keywords)
+        self._alphabet = {char: i for i, char in enumerate(sorted(set("".join(self._words))))}
+        self._lengths = np.array([len(word) for word in self._words], dtype=np.int64)
+        self._char_counts = np.zeros((len(self._words), len(self._alphabet)), dtype=np.int64)
+        for row, word in enumerate(self._words):
+            for char in word:
+                self._char_counts[row, self._alphabet[char]] += 1
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.keywords
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def best_match(self, word: str) -> Optional[str]:
+        """Keyword paling mirip dengan word, atau None jika tidak ada yang >= cutoff"""
+        if not word or not self._words:
+            return None
+
+        word_length = len(word)
+        word_counts = np.zeros(len(self._alphabet), dtype=np.int64)
+        for char in word:
+            index = self._alphabet.get(char)
+            if index is not None:
+                word_counts[index] += 1
+
+        # Rumus sama persis dengan real_quick_ratio() dan quick_ratio() di difflib
+        totals = self._lengths + word_length
+        real_quick = 2.0 * np.minimum(self._lengths, word_length) / totals
+        quick = 2.0 * np.minimum(self._char_counts, word_counts).sum(axis=1) / totals
+        candidates = np.flatnonzero((real_quick >= self.cutoff) & (quick >= self.cutoff))
+
+        matcher = SequenceMatcher()
+        matcher.set_seq2(word)
+
+        best = None
+        for row in candidates:
+            keyword = self._words[row]
+            matcher.set_seq1(keyword)
+            score = matcher.ratio()
+            # Tie-break seperti heapq.nlargest di get_close_matches
+            if score >= self.cutoff and (best is None or (score, keyword) > best):
+                best = (score, keyword)
+
+        return best[1] if best else None
@@ -0,0 +1,34 @@
+import cv2
+import numpy as np
+
+
+def preprocess_face_batch(image, boxes):
+    """
+    Semua crop wajah (x, y, w, h) dari satu gambar -> satu array
+    (N, 48, 48, 1) float32 yang dialokasikan sekali. Box yang kosong
+    setelah di-clip ke ukuran gambar dikembalikan di daftar invalid.
+    Modul ini sengaja tidak meng-import model CNN, supaya worker inference
+    executor mode process bisa memanggilnya tanpa ikut me-load TensorFlow.
+    """
+    height, width = image.shape[:2]
+    gray = np.empty((len(boxes), 48, 48), dtype=np.uint8)
+    batch = np.empty((len(boxes), 48, 48, 1), dtype=np.float32)
+    invalid = []
+
+    for i, (x, y, w, h) in enumerate(boxes):
+        x0, y0 = max(int(x), 0), max(int(y), 0)
+        x1, y1 = min(int(x + w), width), min(int(y + h), height)
+        if x1 <= x0 or y1 <= y0:
+            invalid.append(i)
+            gray[i] = 0
+            continue
+        # Urutan sama dengan preprocess_face: resize dulu, baru grayscale
+        roi = cv2.resize(image[y0:y1, x0:x1], (48, 48))
+        if len(roi.shape) == 3:
+            cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY, dst=gray[i])
+        else:
+            gray[i] = roi
+
+    # Normalisasi seluruh batch sekaligus langsung ke buffer input model
+    np.divide(gray, 255.0, out=batch[..., 0], dtype=np.float32)
+    return batch, invalid
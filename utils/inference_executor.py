@@ -0,0 +1,137 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils.stats import percentile
+
+
+EXECUTOR_KINDS = ("thread", "process")
+# Start method default untuk kind="process". fork tidak diizinkan: pool dibuat
+# saat server sudah punya banyak thread (event loop, micro-batcher, TensorFlow)
+# dan lock yang sedang dipegang thread lain ikut tersalin terkunci ke worker.
+PROCESS_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _timed_call(fn: Callable, args: Tuple) -> Tuple[Any, float, float]:
+    # time.monotonic sama di semua proses, jadi waktu tunggu tetap valid untuk process pool
+    started = time.monotonic()
+    result = fn(*args)
+    return result, started, time.monotonic()
+
+
+class InferenceExecutor:
+    """
+    Executor khusus untuk kerja blocking (decode/detect OpenCV, encode JPEG)
+    supaya endpoint async tidak menahan event loop.
+
+    kind="thread" cocok untuk OpenCV/TF yang melepas GIL. kind="process"
+    memakai process pool (forkserver/spawn); fungsi dan argumennya harus bisa
+    di-pickle (fungsi level modul, bukan method objek model). Panggil start()
+    saat startup supaya pool sudah siap sebelum request pertama.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, kind: str = "thread", name: str = "inference",
+                 start_method: Optional[str] = None):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor kind '{kind}', choose one of {list(EXECUTOR_KINDS)}")
+        if kind == "process" and start_method == "fork":
+            raise ValueError("Process executor cannot use the 'fork' start method, use 'forkserver' or 'spawn'")
+        self.kind = kind
+        self.name = name
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.start_method = start_method or (PROCESS_START_METHOD if kind == "process" else None)
+
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.max_queue_depth = 0
+        self._wait_ms: deque = deque(maxlen=1000)
+        self._exec_ms: deque = deque(maxlen=1000)
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    if self.kind == "process":
+                        context = multiprocessing.get_context(self.start_method)
+                        self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+                    else:
+                        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._pool
+
+    def start(self):
+        """Buat pool sekarang (startup hook); untuk process pool semua worker langsung di-spawn"""
+        pool = self._get_pool()
+        if self.kind == "process":
+            # ProcessPoolExecutor menambah worker per submit selama belum ada yang idle
+            for _ in range(self.max_workers):
+                pool.submit(os.getpid)
+
+    async def run_local(self, fn: Callable, *args) -> Any:
+        """
+        Untuk fn yang harus berjalan di proses ini (state tracker, objek model):
+        di pool ini jika kind="thread", selain itu di default executor event loop.
+        """
+        if self.kind == "thread":
+            return await self.run(fn, *args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, fn, *args)
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Jalankan fn(*args) di executor dan tunggu hasilnya tanpa memblok event loop"""
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        enqueued = time.monotonic()
+        with self._lock:
+            self.submitted += 1
+            self.in_flight += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.in_flight - self.max_workers)
+
+        try:
+            result, started, finished = await loop.run_in_executor(pool, _timed_call, fn, args)
+        except BaseException:
+            with self._lock:
+                self.in_flight -= 1
+                self.failed += 1
+            raise
+
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+            self._wait_ms.append((started - enqueued) * 1000)
+            self._exec_ms.append((finished - started) * 1000)
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            waits = sorted(self._wait_ms)
+            executions = sorted(self._exec_ms)
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "in_flight": self.in_flight,
+                "queue_depth": max(0, self.in_flight - self.max_workers),
+                "max_queue_depth": self.max_queue_depth,
+                "wait_ms_p50": round(percentile(waits, 0.50), 3),
+                "wait_ms_p95": round(percentile(waits, 0.95), 3),
+                "exec_ms_p50": round(percentile(executions, 0.50), 3),
+                "exec_ms_p95": round(percentile(executions, 0.95), 3),
+            }
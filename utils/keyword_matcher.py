@@ -0,0 +1,133 @@
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+
+
+# Token = rangkaian huruf/angka, boleh disambung tanda hubung ("gila-gilaan")
+TOKEN_PATTERN = re.compile(r"\w+(?:-\w+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text)
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton di level token untuk semua keyword emosi.
+
+    Keyword multi-kata ("naik darah") menjadi satu path di trie, sehingga
+    satu kali scan linear atas token teks sudah cukup untuk menemukan semua
+    keyword yang muncul, dan match selalu berada di batas kata.
+    """
+
+    def __init__(self, vocabulary: Dict[str, List[str]]):
+        self.labels = list(vocabulary.keys())
+        self.keywords: List[Tuple[str, str]] = []  # keyword_id -> (emotion, keyword)
+
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for emotion, keywords in vocabulary.items():
+            # Keyword duplikat dalam satu emosi cukup dihitung sekali
+            for keyword in dict.fromkeys(keywords):
+                tokens = tokenize(keyword.lower())
+                if not tokens:
+                    continue
+                keyword_id = len(self.keywords)
+                self.keywords.append((emotion, keyword))
+                self._insert(tokens, keyword_id)
+
+        self._build_failure_links()
+
+        # Matrix keyword x emosi untuk scoring batch dalam satu perkalian sparse
+        label_index = {emotion: i for i, emotion in enumerate(self.labels)}
+        self.emotion_matrix = sparse.csr_matrix(
+            (
+                np.ones(len(self.keywords), dtype=np.int32),
+                (np.arange(len(self.keywords)), [label_index[emotion] for emotion, _ in self.keywords]),
+            ),
+            shape=(len(self.keywords), len(self.labels)),
+        )
+
+    def _insert(self, tokens: List[str], keyword_id: int):
+        state = 0
+        for token in tokens:
+            next_state = self._goto[state].get(token)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][token] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(keyword_id)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(token, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                # Gabungkan output dari suffix terpanjang (dictionary link)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find(self, tokens: Iterable[str]) -> Set[int]:
+        """Satu pass linear atas token, return set keyword_id yang match"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+
+        found = set()
+        state = 0
+        for token in tokens:
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+    def match(self, tokens: Iterable[str]) -> Tuple[Dict[str, int], Dict[str, List[str]]]:
+        """
+        Return jumlah keyword yang match per emosi dan daftar keyword-nya
+        (urutan mengikuti urutan di vocabulary)
+        """
+        counts = {emotion: 0 for emotion in self.labels}
+        matches = self.group_matches(self.find(tokens))
+        for emotion, keywords in matches.items():
+            counts[emotion] = len(keywords)
+        return counts, matches
+
+    def group_matches(self, keyword_ids: Iterable[int]) -> Dict[str, List[str]]:
+        matches = {emotion: [] for emotion in self.labels}
+        for keyword_id in sorted(keyword_ids):
+            emotion, keyword = self.keywords[keyword_id]
+            matches[emotion].append(keyword)
+        return matches
+
+    def count_batch(self, keyword_id_sets: List[Set[int]]) -> np.ndarray:
+        """
+        Hitung jumlah keyword per emosi untuk banyak teks sekaligus:
+        matrix biner (teks x keyword) dikali emotion_matrix (keyword x emosi)
+        """
+        indptr = np.zeros(len(keyword_id_sets) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(ids) for ids in keyword_id_sets])
+        indices = np.fromiter(
+            (keyword_id for ids in keyword_id_sets for keyword_id in ids),
+            dtype=np.int64,
+            count=int(indptr[-1]),
+        )
+        hits = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.int32), indices, indptr),
+            shape=(len(keyword_id_sets), len(self.keywords)),
+        )
+        return (hits @ self.emotion_matrix).toarray()
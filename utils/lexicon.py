@@ -0,0 +1,147 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import struct
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from utils.correction_index import CorrectionIndex
+from utils.keyword_matcher import KeywordMatcher
+
+
+# Header file artifact: magic + versi format, lalu payload pickle
+LEXICON_MAGIC = b"EMOLEX"
+LEXICON_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<6sH")
+
+DEFAULT_LEXICON_PATH = os.path.join("models", "lexicon.bin")
+
+
+class Lexicon:
+    """
+    Vocabulary emosi + kamus typo + semua index turunannya (automaton keyword
+    dan index fuzzy-correction) dalam satu objek. Dianggap immutable setelah
+    dibangun; hot reload dilakukan dengan mengganti objeknya, bukan isinya.
+    """
+
+    def __init__(self, vocabulary: Dict[str, List[str]], typos: Dict[str, str],
+                 similarity_threshold: float, version: Optional[str] = None):
+        self.vocabulary = {emotion: list(keywords) for emotion, keywords in vocabulary.items()}
+        self.typos = dict(typos)
+        self.similarity_threshold = similarity_threshold
+        self.version = version or self.content_hash()
+        self.built_at = time.time()
+
+        self.keyword_matcher = KeywordMatcher(self.vocabulary)
+        self.correction_index = CorrectionIndex(
+            (kw for emotion_keywords in self.vocabulary.values() for kw in emotion_keywords),
+            cutoff=similarity_threshold
+        )
+
+        # Diisi text_processing.set_lexicon() saat lexicon diaktifkan
+        self.generation = 0
+
+    def content_hash(self) -> str:
+        payload = json.dumps(
+            [self.vocabulary, self.typos, self.similarity_threshold],
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+    def info(self) -> Dict:
+        return {
+            "version": self.version,
+            "generation": self.generation,
+            "built_at": self.built_at,
+            "emotions": len(self.vocabulary),
+            "keywords": len(self.keyword_matcher.keywords),
+            "typos": len(self.typos),
+            "similarity_threshold": self.similarity_threshold,
+        }
+
+
+def save_lexicon(lexicon: Lexicon, path: str):
+    """Tulis artifact secara atomic (tulis ke file sementara lalu rename)"""
+    payload = pickle.dumps(lexicon, protocol=pickle.HIGHEST_PROTOCOL)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".lexicon-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(LEXICON_MAGIC, LEXICON_FORMAT_VERSION))
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_lexicon(path: str) -> Lexicon:
+    """
+    Load artifact dengan satu kali baca file. Artifact berisi pickle, jadi
+    hanya load file hasil build sendiri (bukan upload dari luar).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if len(data) < _HEADER.size:
+        raise ValueError(f"Invalid lexicon file: {path}")
+    magic, format_version = _HEADER.unpack_from(data)
+    if magic != LEXICON_MAGIC:
+        raise ValueError(f"Invalid lexicon file: {path}")
+    if format_version != LEXICON_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported lexicon format {format_version} (expected {LEXICON_FORMAT_VERSION}), rebuild the artifact"
+        )
+
+    lexicon = pickle.loads(data[_HEADER.size:])
+    if not isinstance(lexicon, Lexicon):
+        raise ValueError(f"Invalid lexicon file: {path}")
+    return lexicon
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build / inspect compiled emotion lexicon artifact")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Compile vocabulary + typo map + index ke artifact")
+    build.add_argument("--source", help="JSON dengan key 'vocabulary' dan 'typos' (default: kamus bawaan di utils/text_processing.py)")
+    build.add_argument("--out", default=DEFAULT_LEXICON_PATH)
+    build.add_argument("--version", help="Label versi (default: hash isi lexicon)")
+
+    info = subparsers.add_parser("info", help="Tampilkan info artifact")
+    info.add_argument("path", nargs="?", default=DEFAULT_LEXICON_PATH)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from utils.text_processing import COMMON_TYPOS, EMOTION_VOCABULARY, SIMILARITY_THRESHOLD
+
+        vocabulary, typos, threshold = EMOTION_VOCABULARY, COMMON_TYPOS, SIMILARITY_THRESHOLD
+        if args.source:
+            with open(args.source, encoding="utf-8") as f:
+                source = json.load(f)
+            vocabulary = source["vocabulary"]
+            typos = source.get("typos", typos)
+            threshold = source.get("similarity_threshold", threshold)
+
+        lexicon = Lexicon(vocabulary, typos, threshold, version=args.version)
+        save_lexicon(lexicon, args.out)
+        print(f"✅ Lexicon {lexicon.version} written to {args.out} ({os.path.getsize(args.out)} bytes)")
+    else:
+        start = time.perf_counter()
+        lexicon = load_lexicon(args.path)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(json.dumps(dict(lexicon.info(), load_ms=round(elapsed_ms, 2)), indent=2))
+
+
+if __name__ == "__main__":
+    # Jalankan lewat modul utils.lexicon (bukan __main__) supaya class yang
+    # ter-pickle adalah utils.lexicon.Lexicon dan bisa di-load oleh server
+    from utils.lexicon import main as lexicon_main
+    lexicon_main()
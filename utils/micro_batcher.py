@@ -0,0 +1,157 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from utils.stats import percentile
+
+
+class MicroBatcher:
+    """
+    Scheduler inference lintas request: input dari semua caller dimasukkan ke
+    satu antrian, lalu satu thread worker menggabungkannya menjadi batch dan
+    memanggil predict_fn sekali per batch.
+
+    Batch di-flush saat sudah berisi max_batch_size item, atau saat item
+    tertua sudah menunggu max_wait_ms. Blok dari submit_block() yang lebih
+    besar dari max_batch_size dijalankan sendiri dalam satu forward pass. Setiap caller mendapat Future dengan
+    baris hasilnya sendiri (await lewat asyncio.wrap_future dari event loop).
+    """
+
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray], max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, max_queue: int = 1024, name: str = "micro-batcher"):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._carry = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+        self.errors = 0
+        self.max_queue_depth = 0
+        self._batch_sizes: deque = deque(maxlen=1000)
+        self._wait_ms: deque = deque(maxlen=1000)
+        self._inference_ms: deque = deque(maxlen=1000)
+
+    def submit(self, item: np.ndarray) -> Future:
+        """
+        Masukkan satu input ke antrian, Future berisi satu baris output.
+        Raise RuntimeError jika antrian penuh.
+        """
+        return self._enqueue(item[np.newaxis], single=True)
+
+    def submit_block(self, items: np.ndarray) -> Future:
+        """
+        Masukkan beberapa input yang sudah di-stack (N, ...) sebagai satu unit:
+        selalu masuk batch yang sama, Future berisi N baris output
+        """
+        return self._enqueue(items, single=False)
+
+    def _enqueue(self, rows: np.ndarray, single: bool) -> Future:
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put_nowait((rows, future, time.perf_counter(), single))
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            raise RuntimeError(f"{self.name} queue is full ({self._queue.maxsize} pending)")
+
+        with self._stats_lock:
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return future
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> List[tuple]:
+        # Blok sampai ada item pertama, lalu kumpulkan sampai batch penuh / deadline.
+        # Unit yang tidak muat lagi disimpan untuk batch berikutnya.
+        first, self._carry = self._carry or self._queue.get(), None
+        batch = [first]
+        rows = len(first[0])
+        deadline = first[2] + self.max_wait
+        while rows < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                if timeout <= 0:
+                    entry = self._queue.get_nowait()
+                else:
+                    entry = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if rows + len(entry[0]) > self.max_batch_size:
+                self._carry = entry
+                break
+            batch.append(entry)
+            rows += len(entry[0])
+        return batch
+
+    def _run(self):
+        while True:
+            # Caller yang sudah membatalkan Future-nya tidak ikut dihitung
+            batch = [entry for entry in self._collect() if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            try:
+                outputs = self.predict_fn(np.concatenate([rows for rows, _, _, _ in batch]))
+            except Exception as e:
+                with self._stats_lock:
+                    self.errors += 1
+                for _, future, _, _ in batch:
+                    future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            offset = 0
+            for rows, future, _, single in batch:
+                result = outputs[offset:offset + len(rows)]
+                future.set_result(result[0] if single else result)
+                offset += len(rows)
+
+            with self._stats_lock:
+                self.batches += 1
+                self.items += offset
+                self._batch_sizes.append(offset)
+                self._wait_ms.extend((started - enqueued) * 1000 for _, _, enqueued, _ in batch)
+                self._inference_ms.append((finished - started) * 1000)
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            sizes = list(self._batch_sizes)
+            waits = sorted(self._wait_ms)
+            inference = sorted(self._inference_ms)
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "queue_capacity": self._queue.maxsize,
+                "batches": self.batches,
+                "items": self.items,
+                "rejected": self.rejected,
+                "errors": self.errors,
+                "avg_batch_size": round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+                "max_batch_size_seen": max(sizes) if sizes else 0,
+                "wait_ms_p50": round(percentile(waits, 0.50), 3),
+                "wait_ms_p95": round(percentile(waits, 0.95), 3),
+                "inference_ms_p50": round(percentile(inference, 0.50), 3),
+                "inference_ms_p95": round(percentile(inference, 0.95), 3),
+            }
@@ -0,0 +1,9 @@
+from typing import List
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Percentile nearest-rank dari list yang sudah diurutkan (0.0 jika kosong)"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
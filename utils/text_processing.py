@@ -1,6 +1,11 @@
+import os
 import re
-from typing import Dict, List, Tuple
-from difflib import get_close_matches
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from utils.cache import LRUCache
+from utils.keyword_matcher import tokenize
+from utils.lexicon import DEFAULT_LEXICON_PATH, Lexicon, load_lexicon
 
 
 # Kamus kosakata emosi yang SANGAT LENGKAP
@@ -22,7 +27,7 @@ EMOTION_VOCABULARY = {
         "jemot", "sebal", "bete", "kesel", "gerah", "emosi tinggi", "naik pitam",
         "manggung", "dongkol", "sewot", "ngamuk", "ngacir", "meledak", "labil", "kontol", "memek", "bangsat", "tolol"
         ,"goblok", "bego", "anjing", "babi", "titit", "kntol","kntl", "mmek", "mmk", "asu", "pecun", "bangke", "cukimay",
-        "pendo", "ngentot", "bgst", "bgsat"       
+        "pendo", "ngentot", "bgst", "bgsat",
         # Mixed expressions
         "badmood", "bad mood", "tidak baik", "sangat buruk", "amat benci", 
         "benar-benar marah", "sangat kesal", "benci banget", "dendam mendalam",
@@ -253,119 +258,288 @@ COMMON_TYPOS = {
 SIMILARITY_THRESHOLD = 0.75  # Lowered for better matching
 
 
+# Lexicon aktif (vocabulary + typo + index turunan). Diganti secara atomic
+# lewat set_lexicon(); request yang sedang berjalan tetap memakai objek lama.
+LEXICON_PATH = os.environ.get("TEXT_LEXICON_PATH", DEFAULT_LEXICON_PATH)
+_lexicon: Optional[Lexicon] = None
+_lexicon_generation = 0
+_lexicon_lock = threading.Lock()
+
+# Cache koreksi per token (slang yang sama muncul terus di chat)
+TOKEN_CACHE = LRUCache(
+    maxsize=int(os.environ.get("TEXT_TOKEN_CACHE_SIZE", 50000)),
+    ttl=float(os.environ["TEXT_CACHE_TTL"]) if os.environ.get("TEXT_CACHE_TTL") else None
+)
+
+
+def get_lexicon() -> Lexicon:
+    return _lexicon
+
+
+def set_lexicon(lexicon: Lexicon) -> Lexicon:
+    """
+    Aktifkan lexicon baru. Generation dinaikkan supaya semua cache yang
+    bergantung pada vocabulary (token & prediksi) otomatis invalid.
+    """
+    global _lexicon, _lexicon_generation
+    with _lexicon_lock:
+        _lexicon_generation += 1
+        lexicon.generation = _lexicon_generation
+        _lexicon = lexicon
+    TOKEN_CACHE.clear()
+    return lexicon
+
+
+def reload_lexicon(path: Optional[str] = None) -> Lexicon:
+    """Load artifact lexicon (default: TEXT_LEXICON_PATH) lalu swap tanpa restart"""
+    return set_lexicon(load_lexicon(path or LEXICON_PATH))
+
+
+def rebuild_indexes() -> Lexicon:
+    """
+    Bangun ulang lexicon dari EMOTION_VOCABULARY/COMMON_TYPOS setelah diubah,
+    lalu invalidasi semua cache yang bergantung pada vocabulary
+    """
+    return set_lexicon(Lexicon(EMOTION_VOCABULARY, COMMON_TYPOS, SIMILARITY_THRESHOLD))
+
+
+def _load_initial_lexicon():
+    if os.path.exists(LEXICON_PATH):
+        try:
+            lexicon = reload_lexicon()
+            print(f"✅ [Lexicon] Loaded {lexicon.version} from {LEXICON_PATH}")
+            return
+        except Exception as e:
+            print(f"❌ [Lexicon] Error loading {LEXICON_PATH}: {e}, fallback ke kamus bawaan")
+    rebuild_indexes()
+
+
+_load_initial_lexicon()
+
+
+# Pattern di-compile sekali, dipakai ulang di semua request
+URL_PATTERN = re.compile(r'http\S+|www\S+|https\S+', re.IGNORECASE)
+EMAIL_PATTERN = re.compile(r'\S+@\S+')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+WORD_PATTERN = re.compile(r'\S+')
+PUNCTUATION = "!?.,-"
+PUNCTUATION_TABLE = str.maketrans("", "", PUNCTUATION)
+# Batas kalimat di teks yang sudah dibersihkan (whitespace sudah jadi satu spasi)
+SENTENCE_BOUNDARY_PATTERN = re.compile(r'(?<=[.!?]) ')
+
+
+def clean_text(text: str) -> str:
+    """
+    Hapus URL/email dan rapikan whitespace, casing asli dipertahankan.
+    Sama dengan TextDocument(text).text tanpa tokenisasi/fitur, jadi cukup
+    murah untuk key cache prediksi.
+    """
+    text = URL_PATTERN.sub('', text)
+    text = EMAIL_PATTERN.sub('', text)
+    return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+
 def preprocess_text(text: str) -> str:
-    text = text.lower()
-    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'\S+@\S+', '', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+    return clean_text(text).lower()
+
+
+class Token(NamedTuple):
+    text: str   # kata asli, casing dipertahankan
+    start: int  # offset di TextDocument.text
+    end: int
+    clean: str  # lowercase tanpa tanda baca !?.,-
+
+
+class TextDocument:
+    """
+    Hasil normalisasi dan tokenisasi satu teks yang dipakai ulang oleh semua
+    stage pipeline (koreksi typo, fitur, deteksi keyword), jadi teks cukup
+    dibersihkan, di-lowercase dan di-split satu kali.
+    """
+
+    __slots__ = ("original", "text", "normalized", "tokens", "features", "corrected_text", "validation_info")
+
+    def __init__(self, original: str):
+        self.original = original
+        self.text = clean_text(original)
+        self.normalized = self.text.lower()  # sama dengan preprocess_text(original)
+        self.tokens: List[Token] = []
+        for match in WORD_PATTERN.finditer(self.text):
+            word = match.group()
+            self.tokens.append(Token(word, match.start(), match.end(), word.lower().translate(PUNCTUATION_TABLE)))
+        
+        # Fitur dihitung dari teks dengan casing asli supaya caps lock terdeteksi
+        self.features = _compute_features(self.text, [token.text for token in self.tokens])
+        
+        # Diisi oleh correct_document()
+        self.corrected_text: Optional[str] = None
+        self.validation_info: Optional[Dict] = None
+
+
+def build_document(text: Union[str, TextDocument]) -> TextDocument:
+    if isinstance(text, TextDocument):
+        return text
+    return TextDocument(text)
 
 
-def validate_and_correct_words(text: str) -> Tuple[str, Dict]:
-    words = text.lower().split()
+def correct_word(clean_word: str, lexicon: Optional[Lexicon] = None) -> Tuple[str, Optional[Dict]]:
+    """
+    Koreksi satu token yang sudah dibersihkan.
+    Return (kata_hasil, detail_koreksi atau None jika tidak dikoreksi)
+    """
+    lexicon = lexicon or _lexicon
+    cache_key = (lexicon.generation, clean_word)
+    cached = TOKEN_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    detail = None
+    
+    # Cek di common typos dulu (priority)
+    if clean_word in lexicon.typos:
+        corrected_word = lexicon.typos[clean_word]
+        if clean_word != corrected_word:
+            detail = {
+                "original": clean_word,
+                "corrected": corrected_word,
+                "method": "typo_dictionary",
+                "confidence": 1.0
+            }
+    # Cek di valid keywords
+    elif clean_word in lexicon.correction_index:
+        corrected_word = clean_word
+    # Gunakan fuzzy matching untuk kata yang mirip
+    else:
+        corrected_word = lexicon.correction_index.best_match(clean_word)
+        if corrected_word:
+            # Hitung similarity score
+            similarity = calculate_similarity(clean_word, corrected_word)
+            detail = {
+                "original": clean_word,
+                "corrected": corrected_word,
+                "method": "fuzzy_match",
+                "confidence": round(similarity, 2)
+            }
+        else:
+            # Jika tidak ada match, tetap simpan kata asli
+            corrected_word = clean_word
+    
+    result = (corrected_word, detail)
+    TOKEN_CACHE.put(cache_key, result)
+    return result
+
+
+def _correct_clean_words(clean_words: List[str], lexicon: Lexicon) -> Tuple[str, Dict]:
     corrected_words = []
     corrections = {
-        "total_words": len(words),
+        "total_words": len(clean_words),
         "corrections_made": 0,
         "correction_details": []
     }
     
-    # Semua valid keywords dari semua emotion
-    all_valid_keywords = []
-    for emotion_keywords in EMOTION_VOCABULARY.values():
-        all_valid_keywords.extend(emotion_keywords)
-    
-    all_valid_keywords = list(set(all_valid_keywords))  # Remove duplicates
-    
-    for word in words:
-        clean_word = re.sub(r'[!?.,-]', '', word)
-        
+    for clean_word in clean_words:
         # Skip empty words
         if not clean_word:
             continue
         
-        # Cek di common typos dulu (priority)
-        if clean_word in COMMON_TYPOS:
-            corrected_word = COMMON_TYPOS[clean_word]
-            corrected_words.append(corrected_word)
-            if clean_word != corrected_word:
-                corrections["corrections_made"] += 1
-                corrections["correction_details"].append({
-                    "original": clean_word,
-                    "corrected": corrected_word,
-                    "method": "typo_dictionary",
-                    "confidence": 1.0
-                })
-        # Cek di valid keywords
-        elif clean_word in all_valid_keywords:
-            corrected_words.append(clean_word)
-        # Gunakan fuzzy matching untuk kata yang mirip
-        else:
-            matches = get_close_matches(
-                clean_word, 
-                all_valid_keywords, 
-                n=1, 
-                cutoff=SIMILARITY_THRESHOLD
-            )
-            if matches:
-                corrected_word = matches[0]
-                corrected_words.append(corrected_word)
-                corrections["corrections_made"] += 1
-                
-                # Hitung similarity score
-                similarity = calculate_similarity(clean_word, corrected_word)
-                corrections["correction_details"].append({
-                    "original": clean_word,
-                    "corrected": corrected_word,
-                    "method": "fuzzy_match",
-                    "confidence": round(similarity, 2)
-                })
-            else:
-                # Jika tidak ada match, tetap simpan kata asli
-                corrected_words.append(clean_word)
+        corrected_word, detail = correct_word(clean_word, lexicon)
+        corrected_words.append(corrected_word)
+        if detail:
+            corrections["corrections_made"] += 1
+            corrections["correction_details"].append(dict(detail))
     
     corrected_text = " ".join(corrected_words)
     return corrected_text, corrections
 
 
+def validate_and_correct_words(text: str, lexicon: Optional[Lexicon] = None) -> Tuple[str, Dict]:
+    clean_words = [word.translate(PUNCTUATION_TABLE) for word in text.lower().split()]
+    return _correct_clean_words(clean_words, lexicon or _lexicon)
+
+
+def correct_document(doc: TextDocument, lexicon: Optional[Lexicon] = None) -> Tuple[str, Dict]:
+    """Koreksi typo dari token dokumen, hasilnya disimpan di dokumen"""
+    if doc.validation_info is None:
+        clean_words = [token.clean for token in doc.tokens]
+        doc.corrected_text, doc.validation_info = _correct_clean_words(clean_words, lexicon or _lexicon)
+    return doc.corrected_text, doc.validation_info
+
+
+def split_into_chunks(text: str, max_chars: int) -> List[Tuple[int, int]]:
+    """
+    Bagi teks yang sudah dibersihkan menjadi span (start, end) dengan panjang
+    maksimal max_chars. Kalimat digabung selama muat; kalimat yang lebih
+    panjang dari max_chars dipotong di spasi terdekat, jadi kata tidak pernah
+    terbelah (kecuali satu kata lebih panjang dari max_chars).
+    """
+    sentences = []
+    position = 0
+    for match in SENTENCE_BOUNDARY_PATTERN.finditer(text):
+        sentences.append((position, match.start()))
+        position = match.end()
+    if position < len(text):
+        sentences.append((position, len(text)))
+    
+    pieces = []
+    for start, end in sentences:
+        while end - start > max_chars:
+            cut = text.rfind(' ', start, start + max_chars + 1)
+            if cut <= start:
+                cut = start + max_chars
+                pieces.append((start, cut))
+                start = cut
+            else:
+                pieces.append((start, cut))
+                start = cut + 1
+        if end > start:
+            pieces.append((start, end))
+    
+    chunks = []
+    for start, end in pieces:
+        if chunks and end - chunks[-1][0] <= max_chars:
+            chunks[-1] = (chunks[-1][0], end)
+        else:
+            chunks.append((start, end))
+    return chunks
+
+
 def calculate_similarity(str1: str, str2: str) -> float:
     """Hitung similarity antara dua string"""
     from difflib import SequenceMatcher
     return SequenceMatcher(None, str1, str2).ratio()
 
 
-def extract_text_features(text: str) -> Dict:
+def _compute_features(text: str, words: List[str]) -> Dict:
     features = {
         "text_length": len(text),
-        "word_count": len(text.split()),
-        "punctuation_count": sum(1 for c in text if c in "!?.,-"),
-        "uppercase_ratio": sum(1 for c in text if c.isupper()) / max(len(text), 1),
+        "word_count": len(words),
+        "punctuation_count": sum(text.count(c) for c in PUNCTUATION),
+        "uppercase_ratio": (
+            sum(1 for c in text if c.isupper()) / max(len(text), 1)
+            if text != text.lower() else 0.0
+        ),
         "exclamation_count": text.count("!"),
         "question_count": text.count("?"),
-        "caps_lock_words": len([w for w in text.split() if w.isupper() and len(w) > 1]),
+        "caps_lock_words": sum(1 for w in words if len(w) > 1 and w.isupper()),
     }
     return features
 
 
-def keyword_based_emotion(text: str) -> Tuple[str, float]:
+def extract_text_features(text: str) -> Dict:
+    return _compute_features(text, text.split())
+
+
+def keyword_based_emotion(text: str, lexicon: Optional[Lexicon] = None) -> Tuple[str, float, Dict]:
     """
     Deteksi emosi berdasarkan keyword dengan kosakata yang sangat lengkap
     """
-    text_lower = text.lower()
-    
-    emotions = {}
-    emotion_matches = {}
-
-    for emotion, keywords in EMOTION_VOCABULARY.items():
-        count = 0
-        matched_keywords = []
-        for kw in keywords:
-            if kw in text_lower:
-                count += 1
-                matched_keywords.append(kw)
-        emotions[emotion] = count
-        emotion_matches[emotion] = matched_keywords
-    
+    matcher = (lexicon or _lexicon).keyword_matcher
+    emotions, emotion_matches = matcher.match(tokenize(text.lower()))
+    return emotion_from_counts(emotions, emotion_matches)
+
+
+def emotion_from_counts(emotions: Dict[str, int], emotion_matches: Dict[str, List[str]]) -> Tuple[str, float, Dict]:
+    """Pilih emosi dengan jumlah keyword terbanyak dan hitung confidence dasarnya"""
     if not any(emotions.values()):
         return "neutral", 0.5, {}
     
@@ -377,6 +551,31 @@ def keyword_based_emotion(text: str) -> Tuple[str, float]:
     return max_emotion, confidence, emotion_matches
 
 
+def keyword_based_emotion_batch(texts: List[str], lexicon: Optional[Lexicon] = None) -> List[Tuple[str, float, Dict]]:
+    """
+    Versi batch dari keyword_based_emotion: hasil per teks sama persis,
+    tapi scoring semua teks dilakukan dalam satu perkalian matrix sparse
+    """
+    if not texts:
+        return []
+    
+    matcher = (lexicon or _lexicon).keyword_matcher
+    keyword_id_sets = [matcher.find(tokenize(text.lower())) for text in texts]
+    counts = matcher.count_batch(keyword_id_sets)
+    best = counts.argmax(axis=1)
+    
+    results = []
+    for row, keyword_ids in enumerate(keyword_id_sets):
+        if not keyword_ids:
+            results.append(("neutral", 0.5, {}))
+            continue
+        max_count = int(counts[row, best[row]])
+        confidence = min(0.95, 0.5 + (max_count * 0.15))
+        results.append((matcher.labels[best[row]], confidence, matcher.group_matches(keyword_ids)))
+    
+    return results
+
+
 def get_emotion_explanation(emotion: str, matched_keywords: List[str]) -> str:
     """Memberikan penjelasan mengapa emosi terdeteksi"""
     if not matched_keywords:
@@ -0,0 +1,63 @@
+import os
+import time
+from multiprocessing.sharedctypes import RawArray
+from typing import Dict, List, Optional
+
+
+# Tabel heartbeat bersama antara launcher (serve.py) dan worker hasil fork.
+# Per slot worker: [pid, heartbeat terakhir (epoch detik), jumlah restart, waktu start]
+_FIELDS = 4
+_table = None
+_slot: Optional[int] = None
+
+
+def init_table(workers: int):
+    """Dipanggil proses induk sebelum fork (memori anonim shared, ikut ter-fork)"""
+    global _table
+    _table = RawArray("d", workers * _FIELDS)
+
+
+def worker_count() -> int:
+    return len(_table) // _FIELDS if _table is not None else 0
+
+
+def set_worker(slot: int, pid: int, restarts: int):
+    base = slot * _FIELDS
+    now = time.time()
+    _table[base] = pid
+    _table[base + 1] = now
+    _table[base + 2] = restarts
+    _table[base + 3] = now
+
+
+def set_current_slot(slot: int):
+    global _slot
+    _slot = slot
+
+
+def beat():
+    """Dipanggil worker dari event loop-nya; berhenti berdetak jika loop macet"""
+    if _table is not None and _slot is not None:
+        _table[_slot * _FIELDS + 1] = time.time()
+
+
+def heartbeat_age(slot: int) -> float:
+    return time.time() - _table[slot * _FIELDS + 1]
+
+
+def snapshot() -> Dict:
+    if _table is None:
+        return {"mode": "single", "pid": os.getpid(), "workers": []}
+
+    now = time.time()
+    workers: List[Dict] = []
+    for slot in range(worker_count()):
+        base = slot * _FIELDS
+        workers.append({
+            "slot": slot,
+            "pid": int(_table[base]),
+            "heartbeat_age_s": round(now - _table[base + 1], 2),
+            "restarts": int(_table[base + 2]),
+            "uptime_s": round(now - _table[base + 3], 1),
+        })
+    return {"mode": "prefork", "pid": os.getpid(), "slot": _slot, "workers": workers}